@@ -0,0 +1,264 @@
+import random
+from array import array
+from collections import namedtuple
+from functools import lru_cache
+
+from gamekit import tablecache
+
+from models import (
+    BOARD_SIZE, NEAR_COORDINATES, SHIP_LENGTHS, Direction, ShotResult, cell_bit, iter_bits, placement_directions
+)
+
+PLACEMENT_TABLE_VERSION = 1
+
+
+def _neighbours(index, coordinates, size):
+    row, col = divmod(index, size)
+    mask = 0
+    for x, y in coordinates:
+        mask |= cell_bit(row + x, col + y, size)
+    return mask
+
+
+@lru_cache(maxsize=None)
+def neighbour_masks(size=BOARD_SIZE):
+    return [_neighbours(index, NEAR_COORDINATES, size) for index in range(size * size)]
+
+
+@lru_cache(maxsize=None)
+def diagonal_masks(size=BOARD_SIZE):
+    return [_neighbours(index, ((-1, -1), (-1, 1), (1, -1), (1, 1)), size) for index in range(size * size)]
+
+
+# Which placements of each ship length cover each cell on an empty board.
+# Placements are numbered by their fleet code, (row * size + col) << 1 |
+# vertical, so a placement needs no table of its own: it covers length cells
+# from row * size + col, one apart or size apart. Slots number the distinct
+# lengths; placements[s] has a 1 for every code of slot s that fits on the
+# board and counts[s] how many of them cover each cell. The placements covering
+# cell i are entries[offsets[i]:offsets[i + 1]], packed as code << 8 | slot.
+# density is the fleet weighted sum of the counts, where ProbabilityAI starts.
+class PlacementTable(namedtuple('PlacementTable', 'lengths placements counts offsets entries density')):
+    __slots__ = ()
+
+
+def _build_placement_table(ship_lengths, size):
+    lengths = sorted(set(ship_lengths))
+    cell_count = size * size
+    covering = [[] for _ in range(cell_count)]
+    placements = []
+    counts = []
+    for slot, length in enumerate(lengths):
+        slot_placements = array('B', bytes(2 * cell_count))
+        slot_counts = array('I', [0]) * cell_count
+        for direction in placement_directions(length):
+            vertical = direction == Direction.vertical
+            step = size if vertical else 1
+            for row in range(size - (length - 1 if vertical else 0)):
+                for col in range(size - (0 if vertical else length - 1)):
+                    start = row * size + col
+                    code = start << 1 | vertical
+                    slot_placements[code] = 1
+                    for index in range(start, start + step * length, step):
+                        slot_counts[index] += 1
+                        covering[index].append(code << 8 | slot)
+        placements.append(slot_placements)
+        counts.append(slot_counts)
+
+    offsets = array('I', [0])
+    entries = array('I')
+    for cell_entries in covering:
+        entries.extend(cell_entries)
+        offsets.append(len(entries))
+
+    density = array('I', [0]) * cell_count
+    for length in ship_lengths:
+        slot_counts = counts[lengths.index(length)]
+        for index in range(cell_count):
+            density[index] += slot_counts[index]
+    return [array('I', lengths), offsets, entries, density, *placements, *counts]
+
+
+@lru_cache(maxsize=16)
+def placement_table(ship_lengths=SHIP_LENGTHS, size=BOARD_SIZE):
+    # Cached on disk and shared by every process, keyed by the board size and
+    # the fleet; fleets are sorted so their order does not matter.
+    ship_lengths = tuple(sorted(ship_lengths, reverse=True))
+    arrays = tablecache.load_arrays(
+        'battleship-placements', (size, ship_lengths),
+        lambda: _build_placement_table(ship_lengths, size), PLACEMENT_TABLE_VERSION,
+    )
+    lengths, offsets, entries, density = arrays[:4]
+    count = len(lengths)
+    return PlacementTable(
+        tuple(lengths), tuple(arrays[4:4 + count]), tuple(arrays[4 + count:]), offsets, entries, density
+    )
+
+
+class ShotGrid:
+    def __init__(self, size=BOARD_SIZE):
+        self.size = size
+        self.neighbours = neighbour_masks(size)
+        self.shots = 0
+        self.hits = 0
+        self.empty = 0
+        self.sunk = []
+        self.fired = bytearray(size * size)
+
+    def mark(self, mask):
+        self.shots |= mask
+        for index in iter_bits(mask):
+            self.fired[index] = 1
+
+    def sunk_ship(self, index):
+        ship = 1 << index
+        row, col = divmod(index, self.size)
+        for x, y in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            _row, _col = row + x, col + y
+            while self.hits & cell_bit(_row, _col, self.size):
+                ship |= cell_bit(_row, _col, self.size)
+                _row, _col = _row + x, _col + y
+        return ship
+
+    def record(self, row, col, result):
+        index = row * self.size + col
+        bit = 1 << index
+        self.mark(bit)
+
+        if result == ShotResult.miss:
+            self.empty |= bit
+            return 0, bit
+
+        self.hits |= bit
+        if result == ShotResult.hit:
+            return 0, 0
+
+        ship = self.sunk_ship(index)
+        self.hits &= ~ship
+        self.sunk.append(ship)
+        halo = 0
+        for _index in iter_bits(ship):
+            halo |= self.neighbours[_index]
+        halo &= ~ship
+        self.empty |= halo
+        self.mark(halo & ~self.shots)
+        return ship, halo
+
+
+class RandomAI:
+    def __init__(self, seed=None, ship_lengths=SHIP_LENGTHS, size=BOARD_SIZE):
+        self.random = random.Random(seed)
+        self.size = size
+        self.grid = ShotGrid(size)
+        self.cells = list(range(size * size))
+        self.random.shuffle(self.cells)
+
+    def next_shot(self):
+        while self.grid.fired[self.cells[-1]]:
+            self.cells.pop()
+        return divmod(self.cells[-1], self.size)
+
+    def update(self, row, col, result):
+        self.grid.record(row, col, result)
+
+
+class ProbabilityAI:
+    def __init__(self, seed=None, ship_lengths=SHIP_LENGTHS, size=BOARD_SIZE):
+        self.random = random.Random(seed)
+        self.size = size
+        self.grid = ShotGrid(size)
+        self.diagonals = diagonal_masks(size)
+        self.blocked = 0
+
+        table = placement_table(tuple(ship_lengths), size)
+        self.lengths = table.lengths
+        self.offsets = table.offsets
+        self.entries = table.entries
+        self.weights = [list(ship_lengths).count(length) for length in self.lengths]
+        # Private copies of the placements that fit, cleared as they get ruled out.
+        self.valid = [bytearray(placements) for placements in table.placements]
+        self.density = table.density.tolist()
+
+    def _block(self, mask):
+        mask &= ~self.blocked
+        self.blocked |= mask
+        density = self.density
+        offsets, entries, size = self.offsets, self.entries, self.size
+        valids, weights, lengths = self.valid, self.weights, self.lengths
+        for index in iter_bits(mask):
+            for entry in entries[offsets[index]:offsets[index + 1]].tolist():
+                slot = entry & 0xff
+                code = entry >> 8
+                valid = valids[slot]
+                if not valid[code]:
+                    continue
+                valid[code] = 0
+                weight = weights[slot]
+                start = code >> 1
+                step = size if code & 1 else 1
+                for _index in range(start, start + step * lengths[slot], step):
+                    density[_index] -= weight
+
+    def _sink(self, length):
+        slot = self.lengths.index(length)
+        self.weights[slot] -= 1
+        density = self.density
+        size = self.size
+        for code, valid in enumerate(self.valid[slot]):
+            if valid:
+                start = code >> 1
+                step = size if code & 1 else 1
+                for index in range(start, start + step * length, step):
+                    density[index] -= 1
+
+    def _best(self, scores):
+        best = max(scores.values())
+        cells = [index for index, score in scores.items() if score == best]
+        return divmod(self.random.choice(cells), self.size)
+
+    def _target_scores(self):
+        hits = self.grid.hits
+        hit_count = hits.bit_count()
+        anchor = (hits & -hits).bit_length() - 1
+        scores = {}
+        partial = {}
+        for entry in self.entries[self.offsets[anchor]:self.offsets[anchor + 1]].tolist():
+            slot = entry & 0xff
+            code = entry >> 8
+            weight = self.weights[slot]
+            if not weight or not self.valid[slot][code]:
+                continue
+            length = self.lengths[slot]
+            start = code >> 1
+            step = self.size if code & 1 else 1
+            open_cells = [index for index in range(start, start + step * length, step) if not hits >> index & 1]
+            target = scores if length - len(open_cells) == hit_count else partial
+            for index in open_cells:
+                target[index] = target.get(index, 0) + weight
+        return scores or partial
+
+    def next_shot(self):
+        if self.grid.hits:
+            scores = self._target_scores()
+            if scores:
+                return self._best(scores)
+
+        fired = self.grid.fired
+        scores = {index: score for index, score in enumerate(self.density) if not fired[index]}
+        return self._best(scores)
+
+    def update(self, row, col, result):
+        ship, halo = self.grid.record(row, col, result)
+        index = row * self.size + col
+
+        if result == ShotResult.miss:
+            self._block(1 << index)
+        elif result == ShotResult.hit:
+            # Ships are straight and never touch, so diagonal cells of a hit are empty.
+            diagonals = self.diagonals[index] & ~self.grid.shots
+            self.grid.empty |= diagonals
+            self.grid.mark(diagonals)
+            self._block(diagonals)
+        else:
+            self._sink(ship.bit_count())
+            self._block(ship | halo)
@@ -0,0 +1,60 @@
+import argparse
+import statistics
+import time
+
+from strategies import STRATEGIES, load_strategy
+from models import BOARD_SIZE, SHIP_LENGTHS, Field, FleetGenerator, parse_ship_lengths
+
+
+def play(strategy, field, seed):
+    ai = strategy(seed, field.ship_lengths, field.size)
+    shots = 0
+    latencies = []
+    while not field.empty:
+        start = time.perf_counter()
+        row, col = ai.next_shot()
+        latencies.append(time.perf_counter() - start)
+        result = field.shot(row, col)
+        start = time.perf_counter()
+        ai.update(row, col, result)
+        latencies[-1] += time.perf_counter() - start
+        shots += 1
+    return shots, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Average number of shots to sink a fleet')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--strategy', action='append', choices=STRATEGIES, help='default: random and probability')
+    parser.add_argument('--size', type=int, default=BOARD_SIZE)
+    parser.add_argument('--ships', type=parse_ship_lengths, default=SHIP_LENGTHS, help='comma separated ship lengths')
+    args = parser.parse_args()
+
+    generator = FleetGenerator(args.seed, args.ships, size=args.size)
+    fleets = [generator.fleet() for _ in range(args.games)]
+
+    for name in args.strategy or ('random', 'probability'):
+        strategy = load_strategy(name)
+        shots = []
+        latencies = []
+        for number, fleet in enumerate(fleets):
+            game_shots, game_latencies = play(
+                strategy, Field.from_fleet(fleet, args.size, args.ships), args.seed + number
+            )
+            shots.append(game_shots)
+            latencies.extend(game_latencies)
+
+        latencies.sort()
+        print(
+            f'{name:>12}: '
+            f'mean {statistics.mean(shots):.2f} shots, '
+            f'median {statistics.median(shots)}, '
+            f'min {min(shots)}, max {max(shots)}; '
+            f'move {statistics.mean(latencies) * 1e6:.1f} us avg, '
+            f'{latencies[int(len(latencies) * 0.99)] * 1e6:.1f} us p99'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+import argparse
+import itertools
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from models import Direction, Field, Ship
+
+# Only the Field and Ship API of the original models.py is used, so the same
+# benchmarks can be run against older checkouts for before numbers.
+CELLS = [(row, col) for row in range(10) for col in range(10)]
+FLEET = [
+    (0, 0, Direction.horizontal), (0, 5, Direction.horizontal), (2, 0, Direction.horizontal),
+    (2, 4, Direction.horizontal), (2, 7, Direction.horizontal), (4, 0, Direction.horizontal),
+    (4, 3, Direction.horizontal), (4, 5, Direction.horizontal), (4, 7, Direction.horizontal),
+    (4, 9, Direction.horizontal),
+]
+
+
+def sample_field(ships=len(FLEET)):
+    field = Field()
+    for ship, placement in zip(field.ships[:ships], FLEET):
+        field.place(ship, *placement)
+    return field
+
+
+def bench_ship_coordinates():
+    ship = sample_field().ships[0]
+    return lambda: ship.coordinates
+
+
+def bench_ship_includes():
+    ship = sample_field().ships[0]
+    cells = itertools.cycle(CELLS)
+    return lambda: ship.includes(*next(cells))
+
+
+def bench_field_place():
+    field = sample_field()
+    ship = field.ships[-1]
+    row, col, direction = ship.row, ship.col, ship.direction
+
+    return lambda: field.place(ship, row, col, direction)
+
+
+def bench_field_shot():
+    field = sample_field()
+    cells = itertools.cycle(CELLS)
+    return lambda: field.shot(*next(cells))
+
+
+def bench_field_covering_ship():
+    field = sample_field()
+    cells = itertools.cycle(CELLS)
+    return lambda: field.covering_ship(*next(cells))
+
+
+def bench_field_unplaced_ships():
+    field = sample_field(len(FLEET) // 2)
+    return lambda: next(field.unplaced_ships())
+
+
+def bench_field_randomize():
+    random.seed(0)
+    return Field.randomize
+
+
+def bench_ship_place():
+    ship = Ship(4)
+    return lambda: ship.place(3, 3, Direction.horizontal)
+
+
+BENCHMARKS = {
+    'Ship.coordinates': bench_ship_coordinates,
+    'Ship.includes': bench_ship_includes,
+    'Ship.place': bench_ship_place,
+    'Field.place': bench_field_place,
+    'Field.shot': bench_field_shot,
+    'Field.covering_ship': bench_field_covering_ship,
+    'Field.unplaced_ships': bench_field_unplaced_ships,
+    'Field.randomize': bench_field_randomize,
+}
+
+
+def time_calls(call, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        call()
+    return time.perf_counter() - start
+
+
+def measure_speed(call, duration, repeat=9):
+    # Median of repeat runs of about duration / repeat each, so neither a run
+    # slowed down by the rest of the machine nor a lucky fast one decides it.
+    target = duration / repeat
+    number = 1
+    while True:
+        elapsed = time_calls(call, number)
+        if elapsed >= target / 10:
+            break
+        number *= 2
+    number = max(1, int(number * target / elapsed))
+    return number / statistics.median(time_calls(call, number) for _ in range(repeat))
+
+
+def measure_allocations(call, calls=50):
+    # Peak bytes allocated during one call and blocks that call leaves behind,
+    # from a snapshot diff around each call. Blocks allocated here or by
+    # tracemalloc itself are not counted, and neither is the first pass, which
+    # warms up the call and the filter patterns.
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    tracemalloc.start()
+    try:
+        peak = 0
+        blocks = 0
+        for number in range(calls + 1):
+            before = tracemalloc.take_snapshot().filter_traces(ignore)
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            call()
+            if number:
+                peak += tracemalloc.get_traced_memory()[1] - current
+            after = tracemalloc.take_snapshot().filter_traces(ignore)
+            if number:
+                blocks += sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+            del before, after
+    finally:
+        tracemalloc.stop()
+    return peak / calls, blocks / calls
+
+
+def measure_board_memory(count=1000):
+    tracemalloc.start()
+    try:
+        fields = [sample_field() for _ in range(count)]
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del fields
+    return size / count
+
+
+def run(names, duration, repeat):
+    results = {}
+    for name in names:
+        ops = measure_speed(BENCHMARKS[name](), duration, repeat)
+        peak_bytes, blocks = measure_allocations(BENCHMARKS[name]())
+        results[name] = {'ops_per_sec': ops, 'peak_bytes_per_call': peak_bytes, 'kept_blocks_per_call': blocks}
+        print(f'{name:<22} {ops:>14,.0f} ops/sec {peak_bytes:>10.0f} B peak/call {blocks:>8.2f} blocks kept/call')
+
+    board_bytes = measure_board_memory()
+    results['Field memory'] = {'bytes_per_board': board_bytes}
+    print(f'{"Field memory":<22} {board_bytes:>14,.0f} B/board')
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        if 'bytes_per_board' in result:
+            if result['bytes_per_board'] > old['bytes_per_board'] * (1 + threshold):
+                regressions.append(f"{name}: {old['bytes_per_board']:.0f} -> {result['bytes_per_board']:.0f} B/board")
+            continue
+        if result['ops_per_sec'] < old['ops_per_sec'] * (1 - threshold):
+            regressions.append(f"{name}: {old['ops_per_sec']:,.0f} -> {result['ops_per_sec']:,.0f} ops/sec")
+        if result['peak_bytes_per_call'] > old['peak_bytes_per_call'] * (1 + threshold) + 64:
+            regressions.append(
+                f"{name}: {old['peak_bytes_per_call']:.0f} -> {result['peak_bytes_per_call']:.0f} B peak/call"
+            )
+        # Baselines saved before blocks were measured per call have no entry.
+        kept = old.get('kept_blocks_per_call')
+        if kept is not None and result['kept_blocks_per_call'] > kept * (1 + threshold) + 0.5:
+            regressions.append(f"{name}: {kept:.2f} -> {result['kept_blocks_per_call']:.2f} blocks kept/call")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks for models.py')
+    parser.add_argument('names', nargs='*', metavar='name', help=', '.join(BENCHMARKS))
+    parser.add_argument('--duration', type=float, default=0.5, help='seconds per benchmark')
+    parser.add_argument('--repeat', type=int, default=9, help='timed runs per benchmark, the median one counts')
+    parser.add_argument('--save', metavar='PATH', help='write results to a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH', help='flag regressions against a JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed relative slowdown')
+    args = parser.parse_args()
+
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = run(args.names or list(BENCHMARKS), args.duration, args.repeat)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
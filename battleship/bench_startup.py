@@ -0,0 +1,123 @@
+import argparse
+import fcntl
+import importlib.util
+import os
+import pty
+import statistics
+import struct
+import subprocess
+import sys
+import termios
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Each frontend is started with --startup-check, which draws the first screen
+# and exits, so the wall time covers interpreter start, imports and first paint,
+# and the peak resident memory is what that first screen costs.
+FRONTENDS = {
+    'python': [sys.executable, '-c', 'pass'],
+    'terminal': [sys.executable, os.path.join(HERE, 'terminal.py'), '--startup-check'],
+    'tk': [sys.executable, os.path.join(HERE, 'run.py'), '--startup-check'],
+    'qt': [sys.executable, os.path.join(HERE, 'frames.py'), '--startup-check'],
+}
+
+
+def drain(fd):
+    try:
+        while os.read(fd, 4096):
+            pass
+    except OSError:
+        pass
+
+
+def wait(process, start):
+    # wait4 rather than Popen.wait, to get the peak memory of this child alone.
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    peak = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    return process.returncode, elapsed, peak
+
+
+def run_in_terminal(command, rows=40, cols=120):
+    master, slave = pty.openpty()
+    fcntl.ioctl(slave, termios.TIOCSWINSZ, struct.pack('HHHH', rows, cols, 0, 0))
+    reader = threading.Thread(target=drain, args=(master,), daemon=True)
+    reader.start()
+    env = dict(os.environ, TERM=os.environ.get('TERM', 'xterm-256color'))
+    if env['TERM'] == 'dumb':
+        env['TERM'] = 'xterm-256color'
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdin=slave, stdout=slave, stderr=slave, env=env, cwd=HERE)
+    result = wait(process, start)
+    os.close(slave)
+    reader.join(1)
+    os.close(master)
+    return result
+
+
+def run_windowed(command, env=None):
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return wait(process, start)
+
+
+def available(name):
+    if name == 'qt':
+        return importlib.util.find_spec('PySide2') is not None
+    if name == 'tk':
+        # Tk has no offscreen platform, it needs a display to start.
+        return sys.platform in ('darwin', 'win32') or bool(os.environ.get('DISPLAY'))
+    return True
+
+
+def measure(name, runs):
+    if not available(name):
+        return None
+    timings = []
+    peaks = []
+    for _ in range(runs):
+        if name == 'qt':
+            returncode, elapsed, peak = run_windowed(FRONTENDS[name], dict(os.environ, QT_QPA_PLATFORM='offscreen'))
+        elif name == 'tk':
+            returncode, elapsed, peak = run_windowed(FRONTENDS[name])
+        else:
+            returncode, elapsed, peak = run_in_terminal(FRONTENDS[name])
+        if returncode:
+            raise RuntimeError(f'{name} exited with {returncode}')
+        timings.append(elapsed)
+        peaks.append(peak)
+    return timings, peaks
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold start time and memory of the battleship frontends')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--frontend', action='append', choices=FRONTENDS, help='default: all')
+    parser.add_argument('--budget', type=float, default=300, help='milliseconds allowed for the median start')
+    args = parser.parse_args()
+
+    over_budget = False
+    for name in args.frontend or FRONTENDS:
+        measured = measure(name, args.runs)
+        if measured is None:
+            print(f'{name:>10}: not available')
+            continue
+        timings, peaks = measured
+        median = statistics.median(timings) * 1000
+        verdict = ''
+        if name != 'python':
+            over_budget |= median > args.budget
+            verdict = 'ok' if median <= args.budget else f'over the {args.budget:.0f} ms budget'
+        print(
+            f'{name:>10}: median {median:.1f} ms, min {min(timings) * 1000:.1f} ms, '
+            f'max {max(timings) * 1000:.1f} ms, peak memory {max(peaks) / 2 ** 20:.1f} MiB {verdict}'
+        )
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == '__main__':
+    main()
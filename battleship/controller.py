@@ -0,0 +1,288 @@
+import threading
+
+from models import BOARD_SIZE, SHIP_LENGTHS, Direction, Field, FieldState, ShotResult, placement_coordinates
+from replay import ReplayWriter, ShotLog, read_games
+from strategies import DEFAULT_STRATEGY, load_strategy
+
+# Players are numbered as in replays: the user is player 0 and shoots first.
+USER = 0
+AI = 1
+
+MISS = '.'
+HIT = 'x'
+TEXT = {ShotResult.miss: MISS, ShotResult.hit: HIT}
+
+# Status lines for the frontends, after a shot by (shooter, result) and once
+# the game is over by winner.
+SHOT_MESSAGES = {
+    (USER, ShotResult.hit): 'Nice hit. Shot again',
+    (USER, ShotResult.kill): 'You kill it. Shot again',
+    (USER, ShotResult.miss): 'You miss. AI turn',
+    (AI, ShotResult.hit): 'Nice hit. AI shot again',
+    (AI, ShotResult.kill): 'You lose one ship. AI shot again',
+    (AI, ShotResult.miss): 'You are lucky. AI miss. Your turn',
+}
+TURN_MESSAGES = {USER: 'Your turn', AI: 'AI turn'}
+END_MESSAGES = {USER: 'You win', AI: 'You lose'}
+
+# Seconds of CPU the AI may spend on its next shot while the user is thinking,
+# and how long it waits first so the frontend can draw the last shot without
+# sharing the GIL.
+PONDER_BUDGET = 2.0
+PONDER_DELAY = 0.05
+
+
+class PlacementController:
+    # Ship placement without any rendering. Edits return the changed cells as
+    # (row, col, text), with an empty text for cleared cells. Every state is an
+    # immutable FieldState, so undo and redo only keep references to them.
+    def __init__(self, size=BOARD_SIZE, ship_lengths=SHIP_LENGTHS):
+        self.size = size
+        self.ship_lengths = ship_lengths
+        self.state = FieldState.empty(size, ship_lengths)
+        self.undo_states = []
+        self.redo_states = []
+
+    @property
+    def field(self):
+        return self.state.to_field()
+
+    @property
+    def ready(self):
+        return self.state.ready
+
+    @property
+    def can_undo(self):
+        return bool(self.undo_states)
+
+    @property
+    def can_redo(self):
+        return bool(self.redo_states)
+
+    def text(self, row, col):
+        index = self.state.covering(row, col)
+        return '' if index is None else str(self.ship_lengths[index])
+
+    def cells(self):
+        for index, length in enumerate(self.ship_lengths):
+            for row, col in self.state.coordinates(index):
+                yield row, col, str(length)
+
+    def _switch(self, state):
+        old, self.state = self.state, state
+        cleared = set()
+        drawn = {}
+        for index, (before, after) in enumerate(zip(old.placements, state.placements)):
+            if before == after:
+                continue
+            cleared.update(old.coordinates(index))
+            for cell in state.coordinates(index):
+                drawn[cell] = str(self.ship_lengths[index])
+        changes = [(row, col, '') for row, col in cleared if (row, col) not in drawn]
+        changes.extend((row, col, text) for (row, col), text in drawn.items())
+        return changes
+
+    def _apply(self, state):
+        if state is self.state:
+            return []
+        self.undo_states.append(self.state)
+        self.redo_states.clear()
+        return self._switch(state)
+
+    def undo(self):
+        if not self.undo_states:
+            return []
+        self.redo_states.append(self.state)
+        return self._switch(self.undo_states.pop())
+
+    def redo(self):
+        if not self.redo_states:
+            return []
+        self.undo_states.append(self.state)
+        return self._switch(self.redo_states.pop())
+
+    def reset(self):
+        self.undo_states.clear()
+        self.redo_states.clear()
+        return self._switch(FieldState.empty(self.size, self.ship_lengths))
+
+    def randomize(self, seed=None):
+        return self._apply(Field.randomize(seed, self.size, self.ship_lengths).snapshot())
+
+    def _selection(self, row, col):
+        # The placement select(row, col) would make, as (index, row, col,
+        # direction): rotating the ship under the cell, or else placing the
+        # next ship there horizontally or vertically. None if nothing fits.
+        state = self.state
+        index = state.covering(row, col)
+        if index is None:
+            index = state.next_unplaced()
+            if index is None:
+                return None
+            directions = (Direction.horizontal, Direction.vertical)
+        else:
+            row, col, direction = state.placement(index)
+            directions = (Direction.horizontal if direction == Direction.vertical else Direction.vertical,)
+        for direction in directions:
+            if state.can_place(index, row, col, direction):
+                return index, row, col, direction
+        return None
+
+    def select(self, row, col):
+        selection = self._selection(row, col)
+        return [] if selection is None else self._apply(self.state.place(*selection))
+
+    def preview(self, row, col):
+        # Cells the ship would cover after select(row, col).
+        selection = self._selection(row, col)
+        if selection is None:
+            return frozenset()
+        index, *placement = selection
+        return placement_coordinates(self.ship_lengths[index], *placement)
+
+    def valid_starts(self):
+        # Cells the next ship to place can start from in some direction.
+        index = self.state.next_unplaced()
+        if index is None:
+            return set()
+        return {(row, col) for row, col, _ in self.state.valid_placements(index)}
+
+    def delete(self, row, col):
+        index = self.state.covering(row, col)
+        return [] if index is None else self._apply(self.state.unplace(index))
+
+
+class Speculation:
+    # Runs ai.ponder(stop, budget) on a background thread. The AI only learns
+    # from its own shots, so the work for its next shot can start as soon as the
+    # previous one is recorded and is never made stale by the user's shots.
+    # The AI must not be used while the thread runs; cancel stops it at the
+    # next sample and waits, and the AI keeps what it worked out so far.
+    def __init__(self, ai, budget=PONDER_BUDGET, delay=PONDER_DELAY):
+        self.ai = ai
+        self.budget = budget
+        self.delay = delay
+        self.stop = None
+        self.thread = None
+
+    def _run(self, stop):
+        if not stop.wait(self.delay):
+            self.ai.ponder(stop, self.budget)
+
+    def start(self):
+        self.cancel()
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(self.stop,), name='ai-ponder', daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        if self.thread is not None:
+            self.stop.set()
+            self.thread.join()
+            self.thread = None
+
+
+class GameController:
+    # Game flow without any rendering. The fields keep what each shooter has
+    # revealed; every shot returns the cells whose mark changed, as
+    # (row, col, mark) on the field of the player shot at, and the frontends
+    # only draw those, show message and call ai_shot() while ai_to_move.
+    # Strategies with a ponder method think about their next shot in the
+    # background between AI turns; close() stops that when the game is dropped.
+    def __init__(self, user_field, ai_field=None, seed=None, strategy=DEFAULT_STRATEGY, ponder_budget=PONDER_BUDGET):
+        self.fields = [
+            user_field,
+            ai_field or Field.randomize(seed, size=user_field.size, ship_lengths=user_field.ship_lengths),
+        ]
+        self.ai = load_strategy(strategy)(seed, user_field.ship_lengths, user_field.size)
+        self.history = ShotLog(user_field.size)
+        self.turn = USER
+        self.winner = None
+        self.message = TURN_MESSAGES[USER]
+        self.speculation = Speculation(self.ai, ponder_budget) if hasattr(self.ai, 'ponder') else None
+        self.think_ahead()
+
+    @property
+    def size(self):
+        return self.fields[USER].size
+
+    @property
+    def finished(self):
+        return self.winner is not None
+
+    @property
+    def ai_to_move(self):
+        return not self.finished and self.turn == AI
+
+    def ship_cells(self):
+        for ship in self.fields[USER].ships:
+            for row, col in ship.coordinates:
+                yield row, col, str(ship.length)
+
+    def mark(self, player, row, col):
+        mark = self.fields[player].mark(row, col)
+        return TEXT[mark] if mark else ''
+
+    def marks(self, player):
+        return [(row, col, TEXT[mark]) for row, col, mark in self.fields[player].marks()]
+
+    def think_ahead(self):
+        if self.speculation is not None and not self.finished:
+            self.speculation.start()
+
+    def close(self):
+        if self.speculation is not None:
+            self.speculation.cancel()
+
+    def _shot(self, shooter, row, col):
+        target = 1 - shooter
+        field = self.fields[target]
+        result, marks = field.fire(row, col)
+        self.history.add(row, col, result)
+        if result == ShotResult.miss:
+            self.turn = target
+        elif result == ShotResult.kill and field.empty:
+            self.winner = shooter
+            self.close()
+        self.message = END_MESSAGES[shooter] if self.finished else SHOT_MESSAGES[shooter, result]
+        return result, [(row, col, TEXT[mark]) for row, col, mark in marks]
+
+    def user_shot(self, row, col):
+        if self.finished or self.turn != USER:
+            raise ValueError('not your turn')
+        if not (0 <= row < self.size and 0 <= col < self.size) or self.fields[AI].mark(row, col):
+            raise ValueError('bad cell')
+        return self._shot(USER, row, col)
+
+    def ai_shot(self):
+        if self.finished or self.turn != AI:
+            raise ValueError('not the AI turn')
+        self.close()
+        row, col = self.ai.next_shot()
+        result, changes = self._shot(AI, row, col)
+        self.ai.update(row, col, result)
+        self.think_ahead()
+        return row, col, result, changes
+
+    def replay(self):
+        fields = self.fields
+        return self.history.game((fields[USER].fleet(), fields[AI].fleet()), USER, fields[USER].ship_lengths)
+
+    def save(self, path):
+        with ReplayWriter(path, append=False) as writer:
+            writer.write(self.replay())
+
+    @classmethod
+    def load(cls, path, strategy=DEFAULT_STRATEGY):
+        game = next(read_games(path))
+        controller = cls(*game.fields(), strategy=strategy)
+        controller.close()
+        controller.turn = game.first
+        for player, row, col, result in game.moves():
+            controller._shot(player, row, col)
+            if player == AI:
+                controller.ai.update(row, col, result)
+        if not controller.finished:
+            controller.message = TURN_MESSAGES[controller.turn]
+        controller.think_ahead()
+        return controller
@@ -1,16 +1,160 @@
-import random
+import argparse
+import os
 import sys
-from time import sleep
+import time
+
+from PySide2.QtCore import QEvent, QRect, Qt, QTimer, Signal
+from PySide2.QtGui import QKeySequence, QPainter, QPalette
+from PySide2.QtWidgets import QApplication, QFileDialog, QHBoxLayout, QPushButton, QWidget, QGridLayout, QLabel
+
+from gamekit import metrics
+
+from controller import AI, USER, GameController, PlacementController
+from models import BOARD_SIZE, SHIP_LENGTHS, parse_ship_lengths
+from strategies import DEFAULT_STRATEGY, STRATEGIES
+
+AI_DELAY = int(os.environ.get('BATTLESHIP_AI_DELAY', 1000))
+TIMED_EVENTS = {
+    QEvent.MouseButtonPress: 'MouseButtonPress',
+    QEvent.MouseButtonRelease: 'MouseButtonRelease',
+    QEvent.KeyPress: 'KeyPress',
+    QEvent.Paint: 'Paint',
+}
+
+
+class InstrumentedApplication(QApplication):
+    # Times the whole delivery of input and paint events, filters and slots
+    # connected to them included.
+    def notify(self, receiver, event):
+        name = TIMED_EVENTS.get(event.type())
+        if name is None:
+            return super().notify(receiver, event)
+        start = time.perf_counter()
+        try:
+            return super().notify(receiver, event)
+        finally:
+            metrics.record(f'battleship.event.{name}', time.perf_counter() - start)
 
-from PySide2.QtCore import QEvent, Qt, QObject
-from PySide2.QtWidgets import QApplication, QPushButton, QWidget, QGridLayout, QLabel
 
-from models import Field, Ship, Direction, ShotResult, NEAR_COORDINATES
+class Board(QWidget):
+    clicked = Signal(int, int, object)
+    # The cell under the mouse, (-1, -1) once it leaves the board.
+    hovered = Signal(int, int)
+    max_cell_size = 20
+    max_board_size = 600
+
+    def __init__(self, size=BOARD_SIZE, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        metrics.count('battleship.widgets.Board')
+        self.cells = {}
+        self.valid = frozenset()
+        self.preview = frozenset()
+        self.hover_cell = None
+        self.size = None
+        self.cell_size = self.max_cell_size
+        self.set_size(size)
+
+    def set_size(self, size):
+        if size == self.size:
+            return
+        self.size = size
+        self.cell_size = max(4, min(self.max_cell_size, self.max_board_size // size))
+        self.setFixedSize(size * self.cell_size + 1, size * self.cell_size + 1)
+        self.clear()
+
+    def cell_rect(self, row, col):
+        return QRect(col * self.cell_size, row * self.cell_size, self.cell_size, self.cell_size)
+
+    def text(self, row, col):
+        return self.cells.get((row, col), '')
+
+    def set_text(self, row, col, text):
+        self.apply(((row, col, text),))
+
+    def apply(self, changes):
+        # Store the whole diff first and ask for a single repaint of the area
+        # it covers, instead of one update per cell.
+        dirty = QRect()
+        for row, col, text in changes:
+            if self.cells.get((row, col), '') == text:
+                continue
+            if text:
+                self.cells[row, col] = text
+            else:
+                del self.cells[row, col]
+            dirty = dirty.united(self.cell_rect(row, col))
+        if not dirty.isNull():
+            self.update(dirty)
+
+    def set_highlight(self, valid=(), preview=()):
+        # valid cells get a faint tint, preview cells the highlight colour.
+        valid, preview = frozenset(valid), frozenset(preview)
+        dirty = QRect()
+        for row, col in (self.valid ^ valid) | (self.preview ^ preview):
+            dirty = dirty.united(self.cell_rect(row, col))
+        self.valid, self.preview = valid, preview
+        if not dirty.isNull():
+            self.update(dirty)
+
+    def clear(self):
+        self.cells.clear()
+        self.valid = self.preview = frozenset()
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setPen(self.palette().color(QPalette.Mid))
+        rect = event.rect()
+        first_row = max(0, rect.top() // self.cell_size)
+        last_row = min(self.size - 1, rect.bottom() // self.cell_size)
+        first_col = max(0, rect.left() // self.cell_size)
+        last_col = min(self.size - 1, rect.right() // self.cell_size)
+
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                cell = self.cell_rect(row, col)
+                if (row, col) in self.preview:
+                    background = QPalette.Highlight
+                elif (row, col) in self.valid:
+                    background = QPalette.Midlight
+                else:
+                    background = QPalette.Button
+                painter.fillRect(cell, self.palette().color(background))
+                painter.drawRect(cell)
+                text = self.cells.get((row, col))
+                if text:
+                    painter.setPen(self.palette().color(QPalette.ButtonText))
+                    painter.drawText(cell, Qt.AlignCenter, text)
+                    painter.setPen(self.palette().color(QPalette.Mid))
+
+    def mousePressEvent(self, event):
+        row = event.y() // self.cell_size
+        col = event.x() // self.cell_size
+        if 0 <= row < self.size and 0 <= col < self.size:
+            self.clicked.emit(row, col, event.button())
+
+    def mouseMoveEvent(self, event):
+        row = event.y() // self.cell_size
+        col = event.x() // self.cell_size
+        cell = (row, col) if 0 <= row < self.size and 0 <= col < self.size else None
+        if cell != self.hover_cell:
+            self.hover_cell = cell
+            self.hovered.emit(*(cell or (-1, -1)))
+        super().mouseMoveEvent(event)
+
+    def leaveEvent(self, event):
+        if self.hover_cell is not None:
+            self.hover_cell = None
+            self.hovered.emit(-1, -1)
+        super().leaveEvent(event)
 
 
 class RootWidget(QWidget):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, size=BOARD_SIZE, ship_lengths=SHIP_LENGTHS, strategy=DEFAULT_STRATEGY, **kwargs):
         super().__init__(*args, **kwargs)
+        self.size = size
+        self.ship_lengths = ship_lengths
+        self.strategy = strategy
         self.layout = QGridLayout()
         self.layout.setContentsMargins(0, 0, 0, 0)
         self.setLayout(self.layout)
@@ -18,27 +162,59 @@ class RootWidget(QWidget):
         self.battleField = None
 
     def start_placement(self):
+        metrics.count('battleship.screen_switches')
         if self.battleField:
-            self.battleField.close()
-        self.placeField = PlaceField()
-        self.layout.addWidget(self.placeField)
+            self.battleField.stop()
+            self.battleField.hide()
+        if self.placeField:
+            self.placeField.reset()
+        else:
+            self.placeField = PlaceField(size=self.size, ship_lengths=self.ship_lengths)
+            self.layout.addWidget(self.placeField, 0, 0)
+        self.placeField.show()
 
     def start_battle(self):
+        metrics.count('battleship.screen_switches')
         field = self.placeField.field
-        self.placeField.close()
-        self.battleField = BattleField(field)
-        self.layout.addWidget(self.battleField)
+        self.placeField.hide()
+        if not self.battleField:
+            self.battleField = BattleField(strategy=self.strategy)
+            self.layout.addWidget(self.battleField, 0, 0)
+        self.battleField.start(field)
+        self.battleField.show()
+
+    def load_game(self):
+        path, _ = QFileDialog.getOpenFileName(self, 'Load game', filter='Replays (*.bsr)')
+        if not path:
+            return
+        metrics.count('battleship.screen_switches')
+        if self.placeField:
+            self.placeField.hide()
+        if not self.battleField:
+            self.battleField = BattleField(strategy=self.strategy)
+            self.layout.addWidget(self.battleField, 0, 0)
+        self.battleField.stop()
+        self.battleField.load_game(path)
+        self.battleField.show()
 
 
 class PlaceField(QWidget):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, size=BOARD_SIZE, ship_lengths=SHIP_LENGTHS, **kwargs):
         super().__init__(*args, **kwargs)
-        self.field = Field()
-        self.buttons = {}
+        metrics.count('battleship.widgets.PlaceField')
+        self.size = size
+        self.placement = PlacementController(size, ship_lengths)
+        self.board = None
         self.next_btn = None
+        self.undo_btn = None
+        self.redo_btn = None
 
         self.init_visual()
 
+    @property
+    def field(self):
+        return self.placement.field
+
     def init_visual(self):
         main_layout = QGridLayout()
 
@@ -47,16 +223,27 @@ class PlaceField(QWidget):
         randomize_btn = QPushButton(text='randomize')
         randomize_btn.clicked.connect(self.randomize_field)
 
-        internal_layout = QGridLayout()
-        internal_layout.setSpacing(0)
-        for row in range(10):
-            for column in range(10):
-                button = QPushButton()
-                button.setFixedSize(20, 20)
-                button.setObjectName(f'{row}_{column}')
-                button.installEventFilter(self)
-                self.buttons[(row, column)] = button
-                internal_layout.addWidget(button, row, column)
+        load_btn = QPushButton(text='load game')
+        load_btn.clicked.connect(root_widget.load_game)
+
+        self.undo_btn = QPushButton(text='undo')
+        self.undo_btn.clicked.connect(self.undo)
+        self.undo_btn.setShortcut(QKeySequence.Undo)
+        self.undo_btn.setEnabled(False)
+
+        self.redo_btn = QPushButton(text='redo')
+        self.redo_btn.clicked.connect(self.redo)
+        self.redo_btn.setShortcut(QKeySequence.Redo)
+        self.redo_btn.setEnabled(False)
+
+        history_layout = QHBoxLayout()
+        history_layout.addWidget(self.undo_btn)
+        history_layout.addWidget(self.redo_btn)
+
+        self.board = Board(self.size)
+        self.board.clicked.connect(self.cell_clicked)
+        self.board.hovered.connect(self.show_preview)
+        self.board.setMouseTracking(True)
 
         self.next_btn = QPushButton(text='Start')
         self.next_btn.clicked.connect(root_widget.start_battle)
@@ -64,219 +251,162 @@ class PlaceField(QWidget):
 
         main_layout.addWidget(label, 0, 0, Qt.AlignCenter)
         main_layout.addWidget(randomize_btn, 1, 0)
-        main_layout.addLayout(internal_layout, 3, 0)
+        main_layout.addWidget(load_btn, 2, 0)
+        main_layout.addWidget(self.board, 3, 0)
+        main_layout.addLayout(history_layout, 4, 0)
         main_layout.addWidget(self.next_btn, 5, 0)
 
         self.setLayout(main_layout)
 
-    def randomize_field(self):
-        self.field = Field.randomize()
-        for button in self.buttons.values():
-            button.setText('')
-
-        for ship in self.field.ships:
-            for row, col in ship.coordinates:
-                self.buttons[(row, col)].setText(str(ship.length))
-
-        self.next_btn.setEnabled(True)
-
-    def rotate_ship(self, ship):
-        old_coordinates = ship.coordinates
-        try:
-            new_coordinates = self.field.rotate_ship(ship)
-        except ValueError:
-            return
-
-        for _row, _col in old_coordinates:
-            if (_row, _col) not in new_coordinates:
-                self.buttons[_row, _col].setText('')
-
-        for _row, _col in new_coordinates:
-            self.buttons[_row, _col].setText(str(ship.length))
-
-    def place_ship(self, row, col):
-        try:
-            unplaced_ship: Ship = next(self.field.unplaced_ships())
-        except StopIteration:
-            return
+    def show_preview(self, row, col):
+        # Valid starts of the next ship and the cells a click would fill,
+        # both straight from the blocked-cell bitboard.
+        if row < 0:
+            self.board.set_highlight()
+        else:
+            self.board.set_highlight(self.placement.valid_starts(), self.placement.preview(row, col))
 
-        try:
-            fields = self.field.place(unplaced_ship, row, col, Direction.horizontal)
-        except ValueError:
-            try:
-                fields = self.field.place(unplaced_ship, row, col, Direction.vertical)
-            except ValueError:
-                return
-        for _row, _col in fields:
-            self.buttons[_row, _col].setText(str(unplaced_ship.length))
+    def draw(self, changes):
+        self.board.apply(changes)
+        self.show_preview(*(self.board.hover_cell or (-1, -1)))
+        self.next_btn.setEnabled(self.placement.ready)
+        self.undo_btn.setEnabled(self.placement.can_undo)
+        self.redo_btn.setEnabled(self.placement.can_redo)
 
-        try:
-            next(self.field.unplaced_ships())
-        except StopIteration:
-            self.next_btn.setEnabled(True)
-
-    def delete_ship(self, ship):
-        old_coordinates = ship.coordinates
-        for _row, _col in old_coordinates:
-            self.buttons[_row, _col].setText('')
-        ship.unplace()
-        self.next_btn.setEnabled(False)
+    def reset(self):
+        self.draw(self.placement.reset())
 
-    def eventFilter(self, obj, event):
-        if event.type() == QEvent.MouseButtonPress:
-            row, col = map(int, obj.objectName().split('_'))
-            covering_ship: Ship = self.field.covering_ship(row, col)
+    def randomize_field(self):
+        self.draw(self.placement.randomize())
 
-            if event.button() == Qt.LeftButton:
-                if covering_ship:
-                    self.rotate_ship(covering_ship)
-                else:
-                    self.place_ship(row, col)
+    def undo(self):
+        self.draw(self.placement.undo())
 
-            elif event.button() == Qt.RightButton and covering_ship:
-                self.delete_ship(covering_ship)
+    def redo(self):
+        self.draw(self.placement.redo())
 
-        return QObject.event(obj, event)
+    def cell_clicked(self, row, col, button):
+        if button == Qt.LeftButton:
+            self.draw(self.placement.select(row, col))
+        elif button == Qt.RightButton:
+            self.draw(self.placement.delete(row, col))
 
 
 class BattleField(QWidget):
-    def __init__(self, field, *args, **kwargs):
+    def __init__(self, *args, ai_delay=AI_DELAY, strategy=DEFAULT_STRATEGY, **kwargs):
         super().__init__(*args, **kwargs)
-        self.user_field = field
-        self.ai_field = Field.randomize()
-        self.user_buttons = {}
-        self.ai_buttons = {}
+        metrics.count('battleship.widgets.BattleField')
+        self.strategy = strategy
+        self.game = None
+        self.user_board = None
+        self.ai_board = None
         self.help_text = None
-        self.lock = False
+        self.ai_timer = QTimer(self)
+        self.ai_timer.setSingleShot(True)
+        self.ai_timer.setInterval(ai_delay)
+        self.ai_timer.timeout.connect(self.ai_turn)
         self.init_visual()
 
     def init_visual(self):
         main_layout = QGridLayout()
 
-        self.help_text = QLabel('Your turn')
+        self.help_text = QLabel()
 
-        user_field_layout = QGridLayout()
-        user_field_layout.setSpacing(0)
-        self.init_user_field(user_field_layout)
+        self.user_board = Board()
+        self.user_board.setEnabled(False)
 
-        ai_field_layout = QGridLayout()
-        ai_field_layout.setSpacing(0)
-        self.init_ai_field(ai_field_layout)
+        self.ai_board = Board()
+        self.ai_board.clicked.connect(self.cell_clicked)
 
         new_game_btn = QPushButton(text='New Game')
         new_game_btn.clicked.connect(root_widget.start_placement)
 
+        save_btn = QPushButton(text='Save')
+        save_btn.clicked.connect(self.save_dialog)
+
         main_layout.addWidget(self.help_text, 0, 0, 1, 2, Qt.AlignCenter)
-        main_layout.addLayout(user_field_layout, 1, 0)
-        main_layout.addLayout(ai_field_layout, 1, 1)
-        main_layout.addWidget(new_game_btn, 3, 0, 1, 2, Qt.AlignCenter)
+        main_layout.addWidget(self.user_board, 1, 0)
+        main_layout.addWidget(self.ai_board, 1, 1)
+        main_layout.addWidget(new_game_btn, 3, 0, Qt.AlignCenter)
+        main_layout.addWidget(save_btn, 3, 1, Qt.AlignCenter)
         self.setLayout(main_layout)
 
-    def init_ai_field(self, layout):
-        for row in range(10):
-            for column in range(10):
-                button = QPushButton()
-                button.setFixedSize(20, 20)
-                button.setObjectName(f'{row}_{column}')
-                button.installEventFilter(self)
-                self.ai_buttons[(row, column)] = button
-                layout.addWidget(button, row, column)
-
-    def init_user_field(self, layout):
-        for row in range(10):
-            for column in range(10):
-                button = QPushButton()
-                button.setFixedSize(20, 20)
-                button.setEnabled(False)
-                self.user_buttons[(row, column)] = button
-                layout.addWidget(button, row, column)
-
-        for ship in self.user_field.ships:
-            for row, col in ship.coordinates:
-                self.user_buttons[(row, col)].setText(str(ship.length))
-
-    def shot(self, btn, row, col, user_turn):
-        if user_turn:
-            buttons = self.ai_buttons
-            field = self.ai_field
-        else:
-            buttons = self.user_buttons
-            field = self.user_field
-
-        ship: Ship = field.covering_ship(row, col)
-
-        if not ship:
-            btn.setText('.')
-            return ShotResult.miss
-
-        btn.setText('x')
-        ship.shot(row, col)
-
-        if ship.alive:
-            return ShotResult.hit
-
-        for row, col in ship.coordinates:
-            for x, y in NEAR_COORDINATES:
-                coords = (row + x, col + y)
-                if coords in buttons and not buttons[coords].text():
-                    buttons[coords].setText('.')
-                    buttons[coords].removeEventFilter(self)
-        return ShotResult.kill
-
-    def endgame(self, user_won=True):
-        if user_won:
-            self.help_text.setText('You win')
-        else:
-            self.help_text.setText('You lose')
-        for button in self.ai_buttons.values():
-            button.removeEventFilter(self)
-
-    def ai_turns(self):
-        possible_turns = list(filter(lambda x: x[1].text() not in ('.', 'x'), self.user_buttons.items()))
-        random.shuffle(possible_turns)
-        for coords, button in possible_turns:
-            self.repaint()
-            sleep(1)
-            ai_shot = self.shot(button, *coords, user_turn=False)
-            if ai_shot == ShotResult.hit:
-                self.help_text.setText('Nice hit. AI shot again')
-            elif ai_shot == ShotResult.kill:
-                self.help_text.setText('You lose one ship. AI shot again')
-                if self.user_field.empty:
-                    self.endgame(user_won=False)
-            else:
-                self.help_text.setText('You are lucky. AI miss. Your turn')
-                break
-
-    def eventFilter(self, obj, event):
-        if event.type() == QEvent.MouseButtonPress and not self.lock:
-            self.lock = True
-            row, col = map(int, obj.objectName().split('_'))
-
-            user_shot = self.shot(obj, row, col, user_turn=True)
-            obj.removeEventFilter(self)
-
-            if user_shot == ShotResult.hit:
-                self.help_text.setText('Nice hit. Shot again')
-            elif user_shot == ShotResult.kill:
-                self.help_text.setText('You kill it. Shot again')
-                if self.ai_field.empty:
-                    self.endgame(user_won=True)
-            else:
-                self.help_text.setText('You miss. AI turn')
-                self.ai_turns()
-
-            self.lock = False
-        return QObject.event(obj, event)
+    def start(self, field, ai_field=None):
+        self.show_game(GameController(field, ai_field, strategy=self.strategy))
+
+    def show_game(self, game):
+        if self.game is not None:
+            self.game.close()
+        self.game = game
+        self.ai_board.set_size(game.size)
+        self.user_board.set_size(game.size)
+        self.ai_board.clear()
+        self.user_board.clear()
+        self.user_board.apply(game.ship_cells())
+        self.user_board.apply(game.marks(USER))
+        self.ai_board.apply(game.marks(AI))
+        self.show_status()
+
+    def show_status(self):
+        self.help_text.setText(self.game.message)
+        if self.game.ai_to_move:
+            self.ai_timer.start()
+
+    def stop(self):
+        self.ai_timer.stop()
+        if self.game is not None:
+            self.game.close()
+
+    def save_game(self, path):
+        self.game.save(path)
+
+    def save_dialog(self):
+        path, _ = QFileDialog.getSaveFileName(self, 'Save game', filter='Replays (*.bsr)')
+        if path:
+            self.save_game(path)
+
+    def load_game(self, path):
+        self.show_game(GameController.load(path, self.strategy))
+
+    @metrics.timed('battleship.ai_turn')
+    def ai_turn(self):
+        metrics.count('battleship.ai_turns')
+        with metrics.timer('battleship.ai_shot'):
+            _, _, _, changes = self.game.ai_shot()
+        self.user_board.apply(changes)
+        self.show_status()
+
+    def closeEvent(self, event):
+        self.stop()
+        super().closeEvent(event)
+
+    def cell_clicked(self, row, col, button):
+        if self.ai_timer.isActive():
+            return
+        try:
+            _, changes = self.game.user_shot(row, col)
+        except ValueError:
+            return
+        self.ai_board.apply(changes)
+        self.show_status()
 
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description='Battleship')
+    parser.add_argument('--size', type=int, default=BOARD_SIZE)
+    parser.add_argument('--ships', type=parse_ship_lengths, default=SHIP_LENGTHS, help='comma separated ship lengths')
+    parser.add_argument('--strategy', default=DEFAULT_STRATEGY, help=f'one of {", ".join(STRATEGIES)} or module:Class')
+    parser.add_argument('--startup-check', action='store_true', help='show the first screen and exit')
+    args, qt_args = parser.parse_known_args()
+
+    app = (InstrumentedApplication if metrics.REGISTRY.enabled else QApplication)(sys.argv[:1] + qt_args)
 
-    root_widget = RootWidget()
+    root_widget = RootWidget(size=args.size, ship_lengths=args.ships, strategy=args.strategy)
     root_widget.start_placement()
     root_widget.show()
     # root_widget.setFixedSize(root_widget.size())
     root_widget.setFixedSize(0, 0)
+    if args.startup_check:
+        QTimer.singleShot(0, app.quit)
 
     sys.exit(app.exec_())
@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+from strategies import STRATEGIES, load_strategy
+from models import ShotResult
+
+RESULTS = {result.value: result for result in ShotResult}
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.games = 0
+        self.wins = 0
+        self.errors = 0
+        self.connected = 0
+        self.peak_connected = 0
+
+    def connect(self):
+        self.connected += 1
+        self.peak_connected = max(self.peak_connected, self.connected)
+
+    def disconnect(self):
+        self.connected -= 1
+
+
+async def play(host, port, games, strategy, stats, connecting):
+    async with connecting:
+        reader, writer = await asyncio.open_connection(host, port)
+    stats.connect()
+    try:
+        for _ in range(games):
+            ai = load_strategy(strategy)()
+            writer.write(b'NEW AI\n')
+            sent_at = None
+            while True:
+                line = await reader.readline()
+                if not line:
+                    raise ConnectionError('server closed the connection')
+                command, *args = line.decode().split()
+
+                if command == 'TURN':
+                    row, col = ai.next_shot()
+                    writer.write(f'S {row} {col}\n'.encode())
+                    sent_at = time.perf_counter()
+                    await writer.drain()
+                elif command == 'R' and args[0] == 'Y':
+                    stats.latencies.append(time.perf_counter() - sent_at)
+                    ai.update(int(args[1]), int(args[2]), RESULTS[args[3]])
+                elif command == 'END':
+                    stats.games += 1
+                    stats.wins += args[0] == 'W'
+                    break
+                elif command == 'ERR':
+                    stats.errors += 1
+        writer.write(b'Q\n')
+        await writer.drain()
+    finally:
+        stats.disconnect()
+        writer.close()
+
+
+async def run(args):
+    stats = Stats()
+    connecting = asyncio.Semaphore(args.connect_concurrency)
+
+    async def player():
+        try:
+            await play(args.host, args.port, args.games, args.strategy, stats, connecting)
+        except (ConnectionError, OSError):
+            stats.errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(player() for _ in range(args.players)))
+    return stats, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Open many simulated players against a local battleship server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--players', type=int, default=1000)
+    parser.add_argument('--games', type=int, default=1, help='games per player')
+    parser.add_argument('--strategy', choices=STRATEGIES, default='random')
+    parser.add_argument('--connect-concurrency', type=int, default=256)
+    args = parser.parse_args()
+
+    stats, elapsed = asyncio.run(run(args))
+
+    latencies = sorted(stats.latencies)
+    print(f'{stats.games} games, {len(latencies)} moves in {elapsed:.2f}s, {stats.errors} errors')
+    print(f'peak connections {stats.peak_connected}, {len(latencies) / elapsed:.0f} moves/sec')
+    print(f'win rate {stats.wins / max(stats.games, 1):.1%}')
+    if latencies:
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        print(f'move latency p50 {quantiles[49] * 1000:.2f} ms, p99 {quantiles[98] * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
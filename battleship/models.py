@@ -1,6 +1,11 @@
 import random
+from collections import namedtuple
 from enum import Enum
+from functools import lru_cache
 
+from gamekit import metrics
+
+BOARD_SIZE = 10
 SHIP_LENGTHS = (4, 3, 3, 2, 2, 2, 1, 1, 1, 1)
 
 NEAR_COORDINATES = [
@@ -16,36 +21,136 @@ class ShotResult(Enum):
     hit = 'h'
 
 
-class CellState:
-    dead = False
-    alive = True
-
-
 class Direction(Enum):
     horizontal = 'h'
     vertical = 'v'
 
 
+def cell_bit(row, col, size=BOARD_SIZE):
+    if 0 <= row < size and 0 <= col < size:
+        return 1 << (row * size + col)
+    return 0
+
+
+def _run(start, length):
+    return ((1 << length) - 1) << start
+
+
+def iter_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def nth_bit(mask, number):
+    # Index of the set bit of mask with number lower set bits below it. Halving
+    # by bit counts keeps this logarithmic in the width of big boards.
+    index = 0
+    width = mask.bit_length()
+    while width > 64:
+        half = width >> 1
+        low = mask & _run(0, half)
+        count = low.bit_count()
+        if number < count:
+            mask = low
+        else:
+            number -= count
+            mask >>= half
+            index += half
+        width = mask.bit_length()
+    for bit in iter_bits(mask):
+        if not number:
+            return index + bit
+        number -= 1
+    raise ValueError('mask has too few set bits')
+
+
+@lru_cache(maxsize=1 << 12)
+def placement_masks(length, row, col, direction, size=BOARD_SIZE):
+    first_row, first_col = max(row - 1, 0), max(col - 1, 0)
+    if direction == Direction.horizontal:
+        mask = _run(row * size + col, length)
+        last_row, last_col = min(row + 1, size - 1), min(col + length, size - 1)
+    else:
+        mask = 0
+        for i in range(length):
+            mask |= 1 << ((row + i) * size + col)
+        last_row, last_col = min(row + length, size - 1), min(col + 1, size - 1)
+
+    halo = 0
+    for _row in range(first_row, last_row + 1):
+        halo |= _run(_row * size + first_col, last_col - first_col + 1)
+    return mask, halo
+
+
+@lru_cache(maxsize=1 << 12)
+def placement_coordinates(length, row, col, direction):
+    if direction == Direction.vertical:
+        return frozenset((row + i, col) for i in range(length))
+    return frozenset((row, col + i) for i in range(length))
+
+
+@lru_cache(maxsize=None)
+def start_masks(length, size=BOARD_SIZE):
+    # Cells a ship of this length can start from without leaving the board,
+    # horizontally and vertically.
+    starts = max(0, size - length + 1)
+    horizontal = 0
+    for row in range(size):
+        horizontal |= _run(row * size, starts)
+    return horizontal, _run(0, starts * size)
+
+
+def placement_starts(length, blocked, size=BOARD_SIZE):
+    # Start cells of every placement clear of blocked, one bitboard per
+    # direction: a start survives only if the next length - 1 cells along the
+    # direction are free too, so this costs length shifts for the whole board.
+    horizontal, vertical = start_masks(length, size)
+    free = ~blocked & _run(0, size * size)
+    horizontal &= free
+    vertical &= free
+    for i in range(1, length):
+        horizontal &= free >> i
+        vertical &= free >> (i * size)
+    return horizontal, vertical
+
+
+def valid_placements(length, blocked, size=BOARD_SIZE):
+    horizontal, vertical = placement_starts(length, blocked, size)
+    for direction in placement_directions(length):
+        for index in iter_bits(horizontal if direction == Direction.horizontal else vertical):
+            yield (*divmod(index, size), direction)
+
+
 class Ship:
-    row = None
-    col = None
-    direction: Direction = None
-    _cells = []
+    # A ship that belongs to a field keeps the field's masks up to date, so
+    # placing, removing or shooting it directly works as well as going through
+    # the field.
+    __slots__ = (
+        'length', 'size', 'field', 'row', 'col', 'direction', 'mask', 'halo', 'hit_mask', 'hits', 'coordinates',
+    )
 
     @classmethod
-    def generate_ships(cls):
-        return [cls(length) for length in SHIP_LENGTHS]
-
-    def __init__(self, length):
-        self._cells = [CellState.alive for _ in range(length)]
+    def generate_ships(cls, ship_lengths=SHIP_LENGTHS, size=BOARD_SIZE, field=None):
+        return [cls(length, size, field) for length in ship_lengths]
 
-    @property
-    def length(self):
-        return len(self._cells)
+    def __init__(self, length, size=BOARD_SIZE, field=None):
+        self.length = length
+        self.size = size
+        self.field = field
+        self.row = None
+        self.col = None
+        self.direction: Direction = None
+        self.mask = 0
+        self.halo = 0
+        self.hit_mask = 0
+        self.hits = 0
+        self.coordinates = frozenset()
 
     @property
     def dead(self):
-        return all(cell == CellState.dead for cell in self._cells)
+        return self.hits == self.length
 
     @property
     def alive(self):
@@ -56,46 +161,185 @@ class Ship:
         return self.row is not None
 
     def includes(self, row, col):
-        return (row, col) in self.coordinates
-
-    def _get_cell(self, row, col):
-        if not self.includes(row, col):
-            return None
-
-        if self.direction == Direction.horizontal:
-            return col - self.col
-        else:
-            return row - self.row
+        return bool(self.mask & cell_bit(row, col, self.size))
 
     def shot(self, row, col):
-        cell = self._get_cell(row, col)
-        self._cells[cell] = CellState.dead
-
-    @property
-    def coordinates(self):
-        if self.direction == Direction.vertical:
-            return list(zip(range(self.row, self.row + self.length), (self.col for _ in range(self.length))))
-        return list(zip((self.row for _ in range(self.length)), range(self.col, self.col + self.length)))
-
-    def place(self, row, col, direction):
-        if direction == Direction.horizontal and col + self.length > 10:
+        bit = self.mask & cell_bit(row, col, self.size)
+        if bit and not self.hit_mask & bit:
+            self.hit_mask |= bit
+            self.hits += 1
+            if self.field is not None:
+                self.field._hit(self, bit)
+
+    @staticmethod
+    def masks(length, row, col, direction, size=BOARD_SIZE):
+        if not (0 <= row < size and 0 <= col < size):
+            raise ValueError
+        if direction == Direction.horizontal and col + length > size:
             raise ValueError
-        if direction == Direction.vertical and row + self.length > 10:
+        if direction == Direction.vertical and row + length > size:
             raise ValueError
+        return placement_masks(length, row, col, direction, size)
+
+    def place(self, row, col, direction):
+        mask, halo = self.masks(self.length, row, col, direction, self.size)
+        if self.field is not None:
+            self.field._move(self, mask, halo)
+        self.mask, self.halo = mask, halo
         self.row = row
         self.col = col
         self.direction = direction
+        self.coordinates = placement_coordinates(self.length, row, col, direction)
 
         return self.coordinates
 
     def unplace(self):
+        if self.field is not None and self.placed:
+            self.field._move(self, 0, 0)
         self.row = None
         self.col = None
+        self.mask = 0
+        self.halo = 0
+        self.coordinates = frozenset()
+
+
+def encode_placement(row, col, direction, size=BOARD_SIZE):
+    return (row * size + col) << 1 | (direction == Direction.vertical)
+
+
+def decode_placement(code, size=BOARD_SIZE):
+    cell, vertical = divmod(code, 2)
+    row, col = divmod(cell, size)
+    return row, col, Direction.vertical if vertical else Direction.horizontal
+
+
+def placement_width(size=BOARD_SIZE):
+    return 1 if 2 * size * size <= 0xff else 2
+
+
+def unplaced_code(size=BOARD_SIZE):
+    return (1 << 8 * placement_width(size)) - 1
+
+
+def pack_fleet(codes, size=BOARD_SIZE):
+    width = placement_width(size)
+    if width == 1:
+        return bytes(codes)
+    return b''.join(code.to_bytes(width, 'little') for code in codes)
+
+
+def unpack_fleet(data, size=BOARD_SIZE):
+    width = placement_width(size)
+    if width == 1:
+        return list(data)
+    return [int.from_bytes(data[i:i + width], 'little') for i in range(0, len(data), width)]
+
+
+def parse_ship_lengths(text):
+    lengths = tuple(int(length) for length in text.split(','))
+    if not lengths or min(lengths) < 1:
+        raise ValueError(f'bad fleet {text!r}')
+    return lengths
+
+
+def placement_directions(length):
+    if length == 1:
+        return (Direction.horizontal,)
+    return (Direction.horizontal, Direction.vertical)
+
+
+class FleetGenerator:
+    def __init__(self, seed=None, ship_lengths=SHIP_LENGTHS, sweeps=2, burn_in=8, size=BOARD_SIZE, max_attempts=1000):
+        self.random = random.Random(seed)
+        self.ship_lengths = tuple(ship_lengths)
+        self.size = size
+        self.sweeps = sweeps
+        self.burn_in = burn_in
+        self.max_attempts = max_attempts
+        self.attempts = 0
+        self.state = None
+
+    def _random_placement(self, length, blocked):
+        # Uniform over the placements clear of blocked, drawn straight from the
+        # start bitboards.
+        size = self.size
+        horizontal, vertical = placement_starts(length, blocked, size)
+        if length == 1:
+            vertical = 0
+        count = horizontal.bit_count()
+        total = count + vertical.bit_count()
+        if not total:
+            return None
+        number = self.random.randrange(total)
+        if number < count:
+            row, col = divmod(nth_bit(horizontal, number), size)
+            direction = Direction.horizontal
+        else:
+            row, col = divmod(nth_bit(vertical, number - count), size)
+            direction = Direction.vertical
+        mask, halo = placement_masks(length, row, col, direction, size)
+        return mask, halo, encode_placement(row, col, direction, size)
+
+    def _initial_state(self):
+        order = sorted(range(len(self.ship_lengths)), key=lambda i: -self.ship_lengths[i])
+        for _ in range(self.max_attempts):
+            self.attempts += 1
+            blocked = 0
+            state = [None] * len(order)
+            for i in order:
+                placement = self._random_placement(self.ship_lengths[i], blocked)
+                if placement is None:
+                    break
+                blocked |= placement[1]
+                state[i] = placement
+            else:
+                return state
+        raise ValueError(f'could not fit ships {self.ship_lengths} on a {self.size}x{self.size} board')
+
+    def _sweep(self):
+        # Gibbs sweep: every ship is redrawn uniformly among the placements
+        # the rest of the fleet allows, which keeps all layouts equally likely.
+        state = self.state
+        suffix = [0] * (len(state) + 1)
+        for i in range(len(state) - 1, -1, -1):
+            suffix[i] = suffix[i + 1] | state[i][1]
+
+        prefix = 0
+        for i, length in enumerate(self.ship_lengths):
+            state[i] = self._random_placement(length, prefix | suffix[i + 1])
+            prefix |= state[i][1]
+
+    def fleet(self):
+        sweeps = self.sweeps
+        if self.state is None:
+            self.state = self._initial_state()
+            sweeps = self.burn_in
+        for _ in range(sweeps):
+            self._sweep()
+        return pack_fleet((placement[2] for placement in self.state), self.size)
+
+    def fleets(self, count):
+        result = bytearray()
+        for _ in range(count):
+            result += self.fleet()
+        return result
 
 
 class Field:
-    def __init__(self):
-        self.ships = Ship.generate_ships()
+    # blocked is the union of the placed ships' halos: a ship fits wherever its
+    # own cells avoid it. revealed holds every cell the shooter knows about:
+    # hits, misses and the halo around sunk ships, which can not hold a ship
+    # either.
+    __slots__ = ('size', 'ships', 'occupied', 'blocked', 'hits', 'misses', 'revealed')
+
+    def __init__(self, size=BOARD_SIZE, ship_lengths=SHIP_LENGTHS):
+        self.size = size
+        self.ships = Ship.generate_ships(ship_lengths, size, self)
+        self.occupied = 0
+        self.blocked = 0
+        self.hits = 0
+        self.misses = 0
+        self.revealed = 0
 
     def unplaced_ships(self):
         while True:
@@ -106,44 +350,100 @@ class Field:
             else:
                 break
 
+    @property
+    def ship_lengths(self):
+        return tuple(ship.length for ship in self.ships)
+
     @property
     def empty(self):
-        return all(
-            ship.dead
-            for ship in self.ships
-        )
+        return self.occupied & ~self.hits == 0
 
     def shot(self, row, col):
-        for ship in self.ships:
-            if ship.includes(row, col):
-                ship.shot(row, col)
-                return ShotResult.kill if ship.dead else ShotResult.hit
-
-        return ShotResult.miss
+        bit = cell_bit(row, col, self.size)
+        self.revealed |= bit
+        if not self.occupied & bit:
+            self.misses |= bit
+            return ShotResult.miss
+
+        ship = self.covering_ship(row, col)
+        ship.shot(row, col)
+        return ShotResult.kill if ship.dead else ShotResult.hit
+
+    def _hit(self, ship, bit):
+        self.hits |= bit
+        self.revealed |= bit
+        if ship.dead:
+            self.revealed |= ship.halo
+
+    def fire(self, row, col):
+        # Like shot, but also returns the cells it revealed as (row, col, mark),
+        # where mark is ShotResult.hit or ShotResult.miss.
+        before = self.revealed
+        result = self.shot(row, col)
+        return result, self._marks(self.revealed & ~before)
+
+    def mark(self, row, col):
+        bit = cell_bit(row, col, self.size)
+        if not self.revealed & bit:
+            return None
+        return ShotResult.hit if self.hits & bit else ShotResult.miss
 
-    def place(self, ship: Ship, row, col, direction):
-        ship.place(row, col, direction)
+    def marks(self):
+        return self._marks(self.revealed)
 
-        searching_coordinates = []
+    def _marks(self, cells):
+        return [
+            (*divmod(index, self.size), ShotResult.hit if self.hits >> index & 1 else ShotResult.miss)
+            for index in iter_bits(cells)
+        ]
 
-        for row, col in ship.coordinates:
-            for x, y in NEAR_COORDINATES:
-                searching_coordinates.append((row + x, col + y))
+    def _reveal(self):
+        self.revealed = self.hits | self.misses
+        for ship in self.ships:
+            ship.hit_mask = self.hits & ship.mask
+            ship.hits = ship.hit_mask.bit_count()
+            if ship.placed and ship.dead:
+                self.revealed |= ship.halo
+
+    def _blocked_without(self, ship):
+        if not ship.placed:
+            return self.blocked
+        blocked = 0
+        for other in self.ships:
+            if other is not ship:
+                blocked |= other.halo
+        return blocked
+
+    def can_place(self, ship: Ship, row, col, direction):
+        try:
+            mask, _ = Ship.masks(ship.length, row, col, direction, self.size)
+        except ValueError:
+            return False
+        return not mask & self._blocked_without(ship)
+
+    def valid_placements(self, ship: Ship):
+        return valid_placements(ship.length, self._blocked_without(ship), self.size)
 
-        for _ship in self.ships:
-            if not _ship.placed or _ship == ship:
-                continue
+    def place(self, ship: Ship, row, col, direction):
+        mask, _ = Ship.masks(ship.length, row, col, direction, self.size)
+        if mask & self._blocked_without(ship):
+            raise ValueError
+        return ship.place(row, col, direction)
 
-            for row, col in searching_coordinates:
-                if _ship.includes(row, col):
-                    ship.unplace()
-                    raise ValueError
+    def unplace(self, ship: Ship):
+        ship.unplace()
 
-        return ship.coordinates
+    def _move(self, ship, mask, halo):
+        # Called by a ship of this field before it takes its new cells.
+        self.blocked = self._blocked_without(ship) | halo
+        self.occupied = self.occupied & ~ship.mask | mask
 
     def covering_ship(self, row, col):
+        bit = cell_bit(row, col, self.size)
+        if not self.occupied & bit:
+            return None
         for ship in self.ships:
-            if ship.placed and ship.includes(row, col):
+            if ship.mask & bit:
                 return ship
 
     def rotate_ship(self, ship):
@@ -155,14 +455,163 @@ class Field:
         )
 
     @classmethod
-    def randomize(cls):
-        field = Field()
-        for ship in field.unplaced_ships():
-            row = random.randint(0, 9)
-            col = random.randint(0, 9)
-            direction = random.choice((Direction.vertical, Direction.horizontal))
-            try:
-                field.place(ship, row, col, direction)
-            except ValueError:
-                continue
+    def from_fleet(cls, data, size=BOARD_SIZE, ship_lengths=SHIP_LENGTHS):
+        field = cls(size, ship_lengths)
+        unplaced = unplaced_code(size)
+        for ship, code in zip(field.ships, unpack_fleet(data, size)):
+            if code != unplaced:
+                field.place(ship, *decode_placement(code, size))
         return field
+
+    def fleet(self):
+        unplaced = unplaced_code(self.size)
+        return pack_fleet((
+            encode_placement(ship.row, ship.col, ship.direction, self.size) if ship.placed else unplaced
+            for ship in self.ships
+        ), self.size)
+
+    def to_bytes(self):
+        size = (self.size * self.size + 7) // 8
+        return self.fleet() + self.hits.to_bytes(size, 'little') + self.misses.to_bytes(size, 'little')
+
+    @classmethod
+    def from_bytes(cls, data, size=BOARD_SIZE, ship_lengths=SHIP_LENGTHS):
+        count = len(ship_lengths) * placement_width(size)
+        mask_size = (size * size + 7) // 8
+        if len(data) != count + 2 * mask_size:
+            raise ValueError('unexpected field size')
+
+        field = cls.from_fleet(data[:count], size, ship_lengths)
+        field.hits = int.from_bytes(data[count:count + mask_size], 'little')
+        field.misses = int.from_bytes(data[count + mask_size:], 'little')
+        field._reveal()
+        return field
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    def snapshot(self):
+        return FieldState.from_field(self)
+
+    @classmethod
+    def load(cls, path, size=BOARD_SIZE, ship_lengths=SHIP_LENGTHS):
+        with open(path, 'rb') as file:
+            return cls.from_bytes(file.read(), size, ship_lengths)
+
+    @classmethod
+    def randomize(cls, seed=None, size=BOARD_SIZE, ship_lengths=SHIP_LENGTHS):
+        with metrics.timer('battleship.randomize'):
+            generator = FleetGenerator(seed, ship_lengths, size=size)
+            field = cls.from_fleet(generator.fleet(), size, ship_lengths)
+        metrics.count('battleship.randomize.calls')
+        metrics.count('battleship.randomize.attempts', generator.attempts)
+        return field
+
+
+# An immutable Field. Ship placements are (mask, halo, code) tuples, or None for
+# a ship still to place, and every edit returns a new state sharing the
+# placements and masks it did not touch, so keeping a state around is free.
+class FieldState(namedtuple('FieldState', 'size ship_lengths placements occupied hits misses')):
+    __slots__ = ()
+
+    @classmethod
+    def empty(cls, size=BOARD_SIZE, ship_lengths=SHIP_LENGTHS):
+        return cls(size, tuple(ship_lengths), (None,) * len(ship_lengths), 0, 0, 0)
+
+    @classmethod
+    def from_field(cls, field):
+        placements = tuple(
+            (ship.mask, ship.halo, encode_placement(ship.row, ship.col, ship.direction, field.size))
+            if ship.placed else None
+            for ship in field.ships
+        )
+        return cls(field.size, field.ship_lengths, placements, field.occupied, field.hits, field.misses)
+
+    def to_field(self):
+        field = Field.from_fleet(self.fleet(), self.size, self.ship_lengths)
+        field.hits = self.hits
+        field.misses = self.misses
+        field._reveal()
+        return field
+
+    @property
+    def ready(self):
+        return None not in self.placements
+
+    @property
+    def finished(self):
+        return self.occupied & ~self.hits == 0
+
+    def placement(self, index):
+        placement = self.placements[index]
+        return decode_placement(placement[2], self.size) if placement else None
+
+    def coordinates(self, index):
+        placement = self.placement(index)
+        return placement_coordinates(self.ship_lengths[index], *placement) if placement else frozenset()
+
+    def next_unplaced(self):
+        unplaced = [index for index, placement in enumerate(self.placements) if placement is None]
+        return max(reversed(unplaced), key=self.ship_lengths.__getitem__) if unplaced else None
+
+    def covering(self, row, col):
+        bit = cell_bit(row, col, self.size)
+        if not self.occupied & bit:
+            return None
+        for index, placement in enumerate(self.placements):
+            if placement and placement[0] & bit:
+                return index
+
+    def blocked(self, skip=None):
+        blocked = 0
+        for index, placement in enumerate(self.placements):
+            if placement and index != skip:
+                blocked |= placement[1]
+        return blocked
+
+    def can_place(self, index, row, col, direction):
+        try:
+            mask, _ = Ship.masks(self.ship_lengths[index], row, col, direction, self.size)
+        except ValueError:
+            return False
+        return not mask & self.blocked(index)
+
+    def valid_placements(self, index):
+        return valid_placements(self.ship_lengths[index], self.blocked(index), self.size)
+
+    def _with(self, index, placement, occupied):
+        placements = self.placements[:index] + (placement,) + self.placements[index + 1:]
+        return self._replace(placements=placements, occupied=occupied)
+
+    def place(self, index, row, col, direction):
+        mask, halo = Ship.masks(self.ship_lengths[index], row, col, direction, self.size)
+        if mask & self.blocked(index):
+            raise ValueError
+        current = self.placements[index]
+        others = self.occupied & ~current[0] if current else self.occupied
+        return self._with(index, (mask, halo, encode_placement(row, col, direction, self.size)), others | mask)
+
+    def unplace(self, index):
+        current = self.placements[index]
+        if current is None:
+            return self
+        return self._with(index, None, self.occupied & ~current[0])
+
+    def rotate(self, index):
+        row, col, direction = self.placement(index)
+        vertical = direction == Direction.vertical
+        return self.place(index, row, col, Direction.horizontal if vertical else Direction.vertical)
+
+    def shot(self, row, col):
+        bit = cell_bit(row, col, self.size)
+        if not self.occupied & bit:
+            return self._replace(misses=self.misses | bit), ShotResult.miss
+
+        state = self._replace(hits=self.hits | bit)
+        mask = self.placements[self.covering(row, col)][0]
+        return state, ShotResult.kill if state.hits & mask == mask else ShotResult.hit
+
+    def fleet(self):
+        unplaced = unplaced_code(self.size)
+        return pack_fleet((placement[2] if placement else unplaced for placement in self.placements), self.size)
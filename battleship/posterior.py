@@ -0,0 +1,281 @@
+import argparse
+import math
+import random
+import time
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+from ai import ShotGrid, iter_bits, neighbour_masks
+from models import BOARD_SIZE, SHIP_LENGTHS, Direction, Field, FleetGenerator, placement_directions, placement_masks
+
+# Sequential importance sampling of the fleets still consistent with what has
+# been seen. Ships through unexplained hits are placed first, always through the
+# lowest such hit, then the rest of the fleet is placed longest first. Each step
+# picks uniformly among the placements that fit, so a layout is drawn with
+# probability prod(1 / n_i) and weighted by prod(n_i) to make every consistent
+# layout count the same. The free phase visits each layout once per ordering of
+# equal length ships, which the weight divides out. States that turn out to have
+# no completion are remembered and never offered again.
+
+
+# hits are cells of ships not sunk yet, empty are known empty cells and sunk
+# holds one mask per sunk ship.
+class Observations(namedtuple('Observations', 'hits empty sunk')):
+    @classmethod
+    def from_field(cls, field):
+        sunk = tuple(ship.mask for ship in field.ships if ship.dead)
+        dead = 0
+        for mask in sunk:
+            dead |= mask
+        return cls(field.hits & ~dead, field.misses, sunk)
+
+    @classmethod
+    def from_grid(cls, grid):
+        return cls(grid.hits, grid.empty, tuple(grid.sunk))
+
+
+@lru_cache(maxsize=16)
+def placement_table(length, size=BOARD_SIZE):
+    placements = []
+    for direction in placement_directions(length):
+        for row in range(size - (length - 1 if direction == Direction.vertical else 0)):
+            for col in range(size - (length - 1 if direction == Direction.horizontal else 0)):
+                placements.append(placement_masks(length, row, col, direction, size))
+    return tuple(placements)
+
+
+def covering_placements(length, index, size=BOARD_SIZE):
+    row, col = divmod(index, size)
+    for direction in placement_directions(length):
+        for offset in range(length):
+            if direction == Direction.horizontal:
+                _row, _col = row, col - offset
+                fits = 0 <= _col and _col + length <= size
+            else:
+                _row, _col = row - offset, col
+                fits = 0 <= _row and _row + length <= size
+            if fits:
+                yield placement_masks(length, _row, _col, direction, size)
+
+
+@lru_cache(maxsize=None)
+def orderings(lengths):
+    return math.prod(math.factorial(count) for count in Counter(lengths).values())
+
+
+def _remove(lengths, length):
+    index = lengths.index(length)
+    return lengths[:index] + lengths[index + 1:]
+
+
+class PosteriorSampler:
+    def __init__(self, observations, ship_lengths=SHIP_LENGTHS, size=BOARD_SIZE, seed=None):
+        self.random = random.Random(seed)
+        self.size = size
+        self.hits = observations.hits
+
+        remaining = sorted(ship_lengths, reverse=True)
+        blocked = observations.empty
+        neighbours = neighbour_masks(size)
+        self.sunk = 0
+        for mask in observations.sunk:
+            try:
+                remaining.remove(mask.bit_count())
+            except ValueError:
+                raise ValueError(f'no ship of length {mask.bit_count()} left to sink') from None
+            self.sunk |= mask
+            for index in iter_bits(mask):
+                blocked |= neighbours[index]
+        self.root = (tuple(remaining), blocked, self.hits)
+
+        self.dead = set()
+        self.samples = 0
+        self.attempts = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.weights = [0.0] * (size * size)
+
+    def _options(self, state):
+        remaining, blocked, uncovered = state
+        hits = self.hits
+        dead = self.dead
+        options = []
+        if uncovered:
+            anchor = (uncovered & -uncovered).bit_length() - 1
+            for length in sorted(set(remaining)):
+                rest = _remove(remaining, length)
+                for mask, halo in covering_placements(length, anchor, self.size):
+                    # A ship with every cell hit would have been reported sunk.
+                    if mask & blocked or halo & ~mask & hits or not mask & ~hits:
+                        continue
+                    child = (rest, blocked | halo, uncovered & ~mask)
+                    if child not in dead:
+                        options.append((mask, child))
+        elif remaining:
+            length, rest = remaining[0], remaining[1:]
+            for mask, halo in placement_table(length, self.size):
+                if mask & blocked:
+                    continue
+                child = (rest, blocked | halo, 0)
+                if child not in dead:
+                    options.append((mask, child))
+        return options
+
+    def sample(self):
+        self.attempts += 1
+        state = self.root
+        weight = 1.0
+        masks = []
+        free = ()
+        while state[0] or state[2]:
+            if not state[2] and not free:
+                free = state[0]
+            options = self._options(state)
+            if not options:
+                self.dead.add(state)
+                if state == self.root:
+                    raise ValueError('no fleet is consistent with the observations')
+                return None
+            weight *= len(options)
+            mask, state = self.random.choice(options)
+            masks.append(mask)
+        return weight / orderings(free), masks
+
+    def run(self, samples=None, time_budget=None):
+        if samples is None and time_budget is None:
+            raise ValueError('give a sample count or a time budget')
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        target = self.samples + samples if samples is not None else None
+        weights = self.weights
+
+        while True:
+            if target is not None and self.samples >= target:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            drawn = self.sample()
+            if drawn is None:
+                continue
+            weight, masks = drawn
+            self.samples += 1
+            self.total += weight
+            self.total_squares += weight * weight
+            for mask in masks:
+                for index in iter_bits(mask):
+                    weights[index] += weight
+        return self
+
+    @property
+    def effective_samples(self):
+        return self.total * self.total / self.total_squares if self.total_squares else 0.0
+
+    def probabilities(self):
+        known = self.sunk | self.hits
+        total = self.total or 1.0
+        return [1.0 if known >> index & 1 else weight / total for index, weight in enumerate(self.weights)]
+
+
+def hit_probabilities(observations, ship_lengths=SHIP_LENGTHS, size=BOARD_SIZE, samples=1000, time_budget=None,
+                      seed=None):
+    return PosteriorSampler(observations, ship_lengths, size, seed).run(samples, time_budget).probabilities()
+
+
+class PosteriorAI:
+    def __init__(self, seed=None, ship_lengths=SHIP_LENGTHS, size=BOARD_SIZE, samples=200, time_budget=None):
+        self.random = random.Random(seed)
+        self.ship_lengths = ship_lengths
+        self.size = size
+        self.samples = samples
+        self.time_budget = time_budget
+        self.grid = ShotGrid(size)
+        # The sampler for the next shot and the seconds it has run, kept
+        # between ponder and next_shot.
+        self.sampler = None
+        self.sampled = 0.0
+
+    def _sampler(self):
+        if self.sampler is None:
+            observations = Observations.from_grid(self.grid)
+            self.sampler = PosteriorSampler(observations, self.ship_lengths, self.size, self.random.random())
+            self.sampled = 0.0
+        return self.sampler
+
+    def _sampling_done(self):
+        if self.samples is not None:
+            return self.sampler.samples >= self.samples
+        return self.sampled >= self.time_budget
+
+    def ponder(self, stop, budget):
+        # Draw the samples for the next shot ahead of time, one at a time, until
+        # there are enough, stop is set or budget seconds of CPU are spent.
+        # Samples continue the same random stream, so the shot next_shot picks
+        # does not depend on how much of the work was done here.
+        sampler = self._sampler()
+        deadline = time.thread_time() + budget
+        while not self._sampling_done() and not stop.is_set() and time.thread_time() < deadline:
+            start = time.perf_counter()
+            sampler.run(1)
+            self.sampled += time.perf_counter() - start
+
+    def next_shot(self):
+        sampler = self._sampler()
+        if not self._sampling_done():
+            if self.samples is not None:
+                sampler.run(self.samples - sampler.samples)
+            else:
+                sampler.run(time_budget=self.time_budget - self.sampled)
+        self.sampler = None
+        probabilities = sampler.probabilities()
+        fired = self.grid.fired
+        best = max(probability for index, probability in enumerate(probabilities) if not fired[index])
+        cells = [index for index, probability in enumerate(probabilities) if probability == best and not fired[index]]
+        return divmod(self.random.choice(cells), self.size)
+
+    def update(self, row, col, result):
+        self.sampler = None
+        self.grid.record(row, col, result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Posterior ship probabilities after random shots at a random fleet')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--shots', type=int, default=30)
+    parser.add_argument('--samples', type=int, default=None)
+    parser.add_argument('--budget', type=float, default=1.0, help='seconds of sampling')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    field = Field.from_fleet(FleetGenerator(args.seed).fleet())
+    cells = rng.sample(range(BOARD_SIZE * BOARD_SIZE), args.shots)
+    for index in cells:
+        field.shot(*divmod(index, BOARD_SIZE))
+
+    start = time.perf_counter()
+    sampler = PosteriorSampler(Observations.from_field(field), seed=args.seed)
+    sampler.run(args.samples, None if args.samples else args.budget)
+    elapsed = time.perf_counter() - start
+    probabilities = sampler.probabilities()
+
+    for row in range(BOARD_SIZE):
+        line = []
+        for col in range(BOARD_SIZE):
+            bit = 1 << (row * BOARD_SIZE + col)
+            if field.hits & bit:
+                line.append('  x')
+            elif field.misses & bit:
+                line.append('  .')
+            else:
+                line.append(f'{min(99, round(probabilities[row * BOARD_SIZE + col] * 100)):>3}')
+        print(' '.join(line))
+
+    unknown = [index for index in range(BOARD_SIZE * BOARD_SIZE) if not (field.hits | field.misses) >> index & 1]
+    brier = sum((probabilities[index] - (field.occupied >> index & 1)) ** 2 for index in unknown) / len(unknown)
+    print(
+        f'{sampler.samples} samples ({sampler.attempts} attempts, {len(sampler.dead)} dead states) '
+        f'in {elapsed:.2f}s, {sampler.samples / elapsed:.0f} samples/sec, '
+        f'effective {sampler.effective_samples:.0f}, brier {brier:.4f}'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+import struct
+from collections import namedtuple
+
+from models import BOARD_SIZE, SHIP_LENGTHS, Field, ShotResult, placement_width
+
+# A replay file is MAGIC followed by game records:
+#   header   flags (bit 0: second player shoots first), board size, ship count, shot count
+#   ships    one length byte per ship
+#   fleets   one placement per ship, first player then second player
+#   cells    the cell index of every shot
+#   results  a 2 bit result code per shot, four to a byte from the low bits up
+# Placements and cell indices take one byte while they fit and two bytes
+# (little-endian) on larger boards, see placement_width and cell_width.
+# Whose shot it is follows from the results, a miss passes the turn.
+MAGIC = b'BSR3'
+HEADER = struct.Struct('<BBBI')
+
+RESULT_CODES = {ShotResult.miss: 0, ShotResult.hit: 1, ShotResult.kill: 2}
+RESULTS = {code: result for result, code in RESULT_CODES.items()}
+
+
+def cell_width(size=BOARD_SIZE):
+    return 1 if size * size <= 0x100 else 2
+
+
+def results_length(shots):
+    return (shots + 3) // 4
+
+
+class ShotLog:
+    # Shots of a game as they are stored in a record, built up one at a time.
+    def __init__(self, size=BOARD_SIZE):
+        self.size = size
+        self.width = cell_width(size)
+        self.cells = bytearray()
+        self.results = bytearray()
+        self.count = 0
+
+    def add(self, row, col, result):
+        self.cells += (row * self.size + col).to_bytes(self.width, 'little')
+        shift = self.count % 4 * 2
+        if not shift:
+            self.results.append(0)
+        self.results[-1] |= RESULT_CODES[result] << shift
+        self.count += 1
+
+    def game(self, fleets, first, ship_lengths=SHIP_LENGTHS):
+        return Game(fleets, first, bytes(self.cells), bytes(self.results), self.size, tuple(ship_lengths))
+
+
+class Game(namedtuple('Game', 'fleets first cells results size ship_lengths', defaults=(BOARD_SIZE, SHIP_LENGTHS))):
+    @property
+    def shots(self):
+        return len(self.cells) // cell_width(self.size)
+
+    def moves(self):
+        player = self.first
+        width = cell_width(self.size)
+        for number in range(self.shots):
+            offset = number * width
+            row, col = divmod(int.from_bytes(self.cells[offset:offset + width], 'little'), self.size)
+            result = RESULTS[self.results[number >> 2] >> (number & 3) * 2 & 3]
+            yield player, row, col, result
+            if result == ShotResult.miss:
+                player = 1 - player
+
+    def fields(self):
+        return [Field.from_fleet(fleet, self.size, self.ship_lengths) for fleet in self.fleets]
+
+    def to_bytes(self):
+        first, second = self.fleets
+        header = HEADER.pack(self.first, self.size, len(self.ship_lengths), self.shots)
+        return header + bytes(self.ship_lengths) + first + second + self.cells + self.results
+
+
+class ReplayWriter:
+    def __init__(self, path, append=True):
+        self.file = open(path, 'ab' if append else 'wb')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+
+    def write(self, game):
+        self.file.write(game if isinstance(game, (bytes, bytearray)) else game.to_bytes())
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_games(path):
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a replay file')
+
+        while True:
+            header = file.read(HEADER.size)
+            if not header:
+                return
+            if len(header) != HEADER.size:
+                raise ValueError('truncated replay record')
+
+            first, size, ships, shots = HEADER.unpack(header)
+            fleet = placement_width(size) * ships
+            cells = ships + 2 * fleet
+            results = cells + cell_width(size) * shots
+            length = results + results_length(shots)
+            body = file.read(length)
+            if len(body) != length:
+                raise ValueError('truncated replay record')
+            ship_lengths = tuple(body[:ships])
+            fleets = (body[ships:ships + fleet], body[ships + fleet:cells])
+            yield Game(fleets, first, body[cells:results], body[results:], size, ship_lengths)
@@ -1,128 +1,322 @@
+import argparse
+import os
 import tkinter
-from functools import partial
 
-EMPTY = 0
-COMP = -1
-USER = 1
+from gamekit import metrics
 
+from controller import AI, USER, GameController, PlacementController
+from models import BOARD_SIZE, SHIP_LENGTHS, parse_ship_lengths
+from strategies import DEFAULT_STRATEGY, STRATEGIES
 
-class Field(tkinter.Frame):
-    def __init__(self, *args, **kwargs):
+AI_DELAY = int(os.environ.get('BATTLESHIP_AI_DELAY', 1000))
+LEFT_BUTTON = 1
+RIGHT_BUTTON = 3
+
+CELL_COLOR = 'white'
+GRID_COLOR = '#a0a0a0'
+VALID_COLOR = '#dce7f3'
+PREVIEW_COLOR = '#8fb3df'
+
+
+class Board(tkinter.Canvas):
+    # A whole board on one canvas: grid lines are drawn once per size and
+    # every cell text is a single canvas item, created, changed or deleted
+    # only when the cell changes. Tk repaints the damaged area when idle, so a
+    # diff applied in one go is drawn in one go.
+    max_cell_size = 24
+    max_board_size = 600
+
+    def __init__(self, master, size=BOARD_SIZE, on_click=None, on_hover=None):
+        super().__init__(master, highlightthickness=0, background=CELL_COLOR)
+        metrics.count('battleship.widgets.Board')
+        self.on_click = on_click
+        self.on_hover = on_hover
+        self.texts = {}
+        self.hover_cell = None
+        self.size = None
+        self.cell_size = self.max_cell_size
+        self.set_size(size)
+        self.bind('<Button-1>', lambda event: self.clicked(event, LEFT_BUTTON))
+        self.bind('<Button-3>', lambda event: self.clicked(event, RIGHT_BUTTON))
+        if on_hover:
+            self.bind('<Motion>', self.moved)
+            self.bind('<Leave>', self.left)
+
+    def set_size(self, size):
+        if size == self.size:
+            return
+        self.size = size
+        self.cell_size = max(4, min(self.max_cell_size, self.max_board_size // size))
+        extent = size * self.cell_size
+        self.configure(width=extent + 1, height=extent + 1)
+        self.clear()
+        self.delete('grid')
+        for i in range(size + 1):
+            self.create_line(0, i * self.cell_size, extent, i * self.cell_size, fill=GRID_COLOR, tags='grid')
+            self.create_line(i * self.cell_size, 0, i * self.cell_size, extent, fill=GRID_COLOR, tags='grid')
+
+    def cell(self, event):
+        row = event.y // self.cell_size
+        col = event.x // self.cell_size
+        return (row, col) if 0 <= row < self.size and 0 <= col < self.size else None
+
+    def cell_box(self, row, col):
+        return col * self.cell_size, row * self.cell_size, (col + 1) * self.cell_size, (row + 1) * self.cell_size
+
+    def text(self, row, col):
+        entry = self.texts.get((row, col))
+        return entry[0] if entry else ''
+
+    def apply(self, changes):
+        half = self.cell_size / 2
+        for row, col, text in changes:
+            entry = self.texts.get((row, col))
+            if entry and entry[0] == text:
+                continue
+            if not text:
+                if entry:
+                    self.delete(entry[1])
+                    del self.texts[row, col]
+            elif entry:
+                self.itemconfigure(entry[1], text=text)
+                self.texts[row, col] = (text, entry[1])
+            else:
+                x, y = col * self.cell_size + half, row * self.cell_size + half
+                item = self.create_text(x, y, text=text, tags='text')
+                self.texts[row, col] = (text, item)
+
+    def set_highlight(self, valid=(), preview=()):
+        self.delete('highlight')
+        for cells, color in ((valid, VALID_COLOR), (preview, PREVIEW_COLOR)):
+            for row, col in cells:
+                self.create_rectangle(*self.cell_box(row, col), fill=color, width=0, tags='highlight')
+        self.tag_lower('highlight')
+
+    def clear(self):
+        self.delete('text', 'highlight')
+        self.texts.clear()
+
+    def clicked(self, event, button):
+        cell = self.cell(event)
+        if cell and self.on_click:
+            self.on_click(*cell, button)
+
+    def moved(self, event):
+        cell = self.cell(event)
+        if cell != self.hover_cell:
+            self.hover_cell = cell
+            self.on_hover(*(cell or (-1, -1)))
+
+    def left(self, event):
+        if self.hover_cell is not None:
+            self.hover_cell = None
+            self.on_hover(-1, -1)
+
+
+class RootWidget(tkinter.Frame):
+    def __init__(self, *args, size=BOARD_SIZE, ship_lengths=SHIP_LENGTHS, strategy=DEFAULT_STRATEGY, **kwargs):
         super().__init__(*args, **kwargs)
-        self.buttons = [[None for _ in range(10)] for _ in range(10)]
-        self.fill_content()
-
-    def fill_content(self):
-        for row in range(10):
-            tkinter.Label(self, text=row + 1, width=3).grid(row=0, column=row + 1)
-            tkinter.Label(self, text=row + 1, width=3).grid(row=row + 1, column=0)
-            for col in range(10):
-                handler = partial(self.make_turn, row, col)
-                self.buttons[row][col] = tkinter.Button(self, command=handler)
-                self.buttons[row][col].grid(row=row + 1, column=col + 1)
-
-    def make_turn(self, row, column):
-        button = self.buttons[row][column]
-        button.destroy()
-
-        print(f'{row} {column}')
-
-
-# class Field(tkinter.Frame):
-#     def __init__(self, *args, **kwargs):
-#         super().__init__(*args, **kwargs)
-#         self.winner = None
-#         self.flags = [EMPTY for _ in range(9)]
-#         self.buttons = [
-#             tkinter.Button(self, text='', command=self.turn(i))
-#             for i in range(9)
-#         ]
-#         for i, btn in enumerate(self.buttons):
-#             btn.grid(row=int(i / 3) + 1, column=i % 3)
-#
-#     def get_empty(self, indexes):
-#         for i in indexes:
-#             if self.flags[i] == EMPTY:
-#                 return i
-#
-#     def find_closest(self, user):
-#         for i in range(3):
-#             if sum(self.flags[i * 3: i * 3 + 3]) == 2 * user:
-#                 return self.get_empty(range(i * 3, i * 3 + 3))
-#
-#             if sum(self.flags[i::3]) == 2 * user:
-#                 return self.get_empty(range(i, len(self.flags), 3))
-#
-#         if sum(self.flags[::4]) == 2 * user:
-#             return self.get_empty(range(0, len(self.flags), 3))
-#
-#         if sum(self.flags[2:7:2]) == 2 * user:
-#             return self.get_empty(range(2, 7, 2))
-#
-#     def ai_turn(self):
-#         win_id = self.find_closest(COMP)
-#         if win_id:
-#             return win_id
-#         block_id = self.find_closest(USER)
-#         if block_id:
-#             return block_id
-#
-#         random_ids = [i for i, x in enumerate(self.flags) if x == EMPTY]
-#         random.shuffle(random_ids)
-#         return random_ids[0]
-#
-#     def make_turn(self, cell, player):
-#         self.buttons[cell].destroy()
-#         lbl = tkinter.Label(self, text='X' if player == USER else 'O', padx=7, pady=6)
-#         lbl.grid(row=int(cell / 3) + 1, column=cell % 3)
-#         self.flags[cell] = player
-#         self.winner = self.get_winner()
-#
-#     def turn(self, user_cell):
-#         def f():
-#             if self.winner is not None:
-#                 return
-#             self.make_turn(user_cell, USER)
-#             if self.winner is not None:
-#                 return self.end_game()
-#
-#             comp_cell = self.ai_turn()
-#             self.make_turn(comp_cell, COMP)
-#
-#             if self.winner is not None:
-#                 return self.end_game()
-#
-#         return f
-#
-#     def end_game(self):
-#         if self.winner == USER:
-#             winner_text = 'You are win'
-#         elif self.winner == COMP:
-#             winner_text = 'You are lose'
-#         else:
-#             winner_text = 'You are draw'
-#         lbl = tkinter.Label(self, text=winner_text)
-#         lbl.grid(row=0, column=0, columnspan=3)
-#
-#     def get_winner(self):
-#         sums = [
-#             *(sum(self.flags[i * 3: i * 3 + 3]) for i in range(3)),
-#             *(sum(self.flags[i::3]) for i in range(3)),
-#             sum(self.flags[::4]),
-#             sum(self.flags[2:7:2])
-#         ]
-#
-#         filtered_sums = [
-#             USER if s == USER * 3 else COMP
-#             for s in sums
-#             if s / 3 in (USER, COMP)
-#         ]
-#
-#         if filtered_sums:
-#             return filtered_sums[0]
-#
-#         if all(map(lambda x: x != EMPTY, self.flags)):
-#             return EMPTY
+        self.size = size
+        self.ship_lengths = ship_lengths
+        self.strategy = strategy
+        self.placeField = None
+        self.battleField = None
+
+    def start_placement(self):
+        metrics.count('battleship.screen_switches')
+        if self.battleField:
+            self.battleField.stop()
+            self.battleField.grid_remove()
+        if self.placeField:
+            self.placeField.reset()
+        else:
+            self.placeField = PlaceField(self, size=self.size, ship_lengths=self.ship_lengths)
+        self.placeField.grid(row=0, column=0)
+
+    def show_battle(self):
+        if self.placeField:
+            self.placeField.grid_remove()
+        if not self.battleField:
+            self.battleField = BattleField(self, strategy=self.strategy)
+        self.battleField.stop()
+        self.battleField.grid(row=0, column=0)
+        return self.battleField
+
+    def start_battle(self):
+        metrics.count('battleship.screen_switches')
+        self.show_battle().start(self.placeField.field)
+
+    def load_game(self):
+        # The dialogs are only needed once asked for, keep them off the startup path.
+        from tkinter import filedialog
+
+        path = filedialog.askopenfilename(parent=self, title='Load game', filetypes=[('Replays', '*.bsr')])
+        if not path:
+            return
+        metrics.count('battleship.screen_switches')
+        self.show_battle().load_game(path)
+
+
+class PlaceField(tkinter.Frame):
+    def __init__(self, master, size=BOARD_SIZE, ship_lengths=SHIP_LENGTHS, **kwargs):
+        super().__init__(master, **kwargs)
+        metrics.count('battleship.widgets.PlaceField')
+        self.size = size
+        self.placement = PlacementController(size, ship_lengths)
+        self.board = None
+        self.next_btn = None
+        self.undo_btn = None
+        self.redo_btn = None
+
+        self.init_visual()
+
+    @property
+    def field(self):
+        return self.placement.field
+
+    def init_visual(self):
+        root_widget = self.master
+
+        tkinter.Label(self, text='Place your ships.').grid(row=0, column=0)
+        tkinter.Button(self, text='randomize', command=self.randomize_field).grid(row=1, column=0, sticky='ew')
+        tkinter.Button(self, text='load game', command=root_widget.load_game).grid(row=2, column=0, sticky='ew')
+
+        self.board = Board(self, self.size, on_click=self.cell_clicked, on_hover=self.show_preview)
+        self.board.grid(row=3, column=0)
+
+        history = tkinter.Frame(self)
+        self.undo_btn = tkinter.Button(history, text='undo', command=self.undo, state=tkinter.DISABLED)
+        self.redo_btn = tkinter.Button(history, text='redo', command=self.redo, state=tkinter.DISABLED)
+        self.undo_btn.pack(side=tkinter.LEFT, expand=True, fill=tkinter.X)
+        self.redo_btn.pack(side=tkinter.LEFT, expand=True, fill=tkinter.X)
+        history.grid(row=4, column=0, sticky='ew')
+
+        self.next_btn = tkinter.Button(self, text='Start', command=root_widget.start_battle, state=tkinter.DISABLED)
+        self.next_btn.grid(row=5, column=0, sticky='ew')
+
+        toplevel = self.winfo_toplevel()
+        for sequence, handler in (('<Control-z>', self.undo), ('<Control-y>', self.redo), ('<Control-Z>', self.redo)):
+            toplevel.bind(sequence, lambda event, handler=handler: self.winfo_ismapped() and handler(), add='+')
+
+    def show_preview(self, row, col):
+        if row < 0:
+            self.board.set_highlight()
+        else:
+            self.board.set_highlight(self.placement.valid_starts(), self.placement.preview(row, col))
+
+    def draw(self, changes):
+        self.board.apply(changes)
+        self.show_preview(*(self.board.hover_cell or (-1, -1)))
+        self.next_btn.configure(state=tkinter.NORMAL if self.placement.ready else tkinter.DISABLED)
+        self.undo_btn.configure(state=tkinter.NORMAL if self.placement.can_undo else tkinter.DISABLED)
+        self.redo_btn.configure(state=tkinter.NORMAL if self.placement.can_redo else tkinter.DISABLED)
+
+    def reset(self):
+        self.draw(self.placement.reset())
+
+    def randomize_field(self):
+        self.draw(self.placement.randomize())
+
+    def undo(self):
+        self.draw(self.placement.undo())
+
+    def redo(self):
+        self.draw(self.placement.redo())
+
+    def cell_clicked(self, row, col, button):
+        if button == LEFT_BUTTON:
+            self.draw(self.placement.select(row, col))
+        elif button == RIGHT_BUTTON:
+            self.draw(self.placement.delete(row, col))
+
+
+class BattleField(tkinter.Frame):
+    def __init__(self, master, ai_delay=AI_DELAY, strategy=DEFAULT_STRATEGY, **kwargs):
+        super().__init__(master, **kwargs)
+        metrics.count('battleship.widgets.BattleField')
+        self.strategy = strategy
+        self.ai_delay = ai_delay
+        self.ai_job = None
+        self.game = None
+        self.user_board = None
+        self.ai_board = None
+        self.help_text = None
+        self.init_visual()
+
+    def init_visual(self):
+        self.help_text = tkinter.Label(self)
+        self.help_text.grid(row=0, column=0, columnspan=2)
+
+        self.user_board = Board(self)
+        self.user_board.grid(row=1, column=0, padx=4, pady=4)
+
+        self.ai_board = Board(self, on_click=self.cell_clicked)
+        self.ai_board.grid(row=1, column=1, padx=4, pady=4)
+
+        tkinter.Button(self, text='New Game', command=self.master.start_placement).grid(row=3, column=0)
+        tkinter.Button(self, text='Save', command=self.save_dialog).grid(row=3, column=1)
+
+    def start(self, field, ai_field=None):
+        self.show_game(GameController(field, ai_field, strategy=self.strategy))
+
+    def show_game(self, game):
+        if self.game is not None:
+            self.game.close()
+        self.game = game
+        self.ai_board.set_size(game.size)
+        self.user_board.set_size(game.size)
+        self.ai_board.clear()
+        self.user_board.clear()
+        self.user_board.apply(game.ship_cells())
+        self.user_board.apply(game.marks(USER))
+        self.ai_board.apply(game.marks(AI))
+        self.show_status()
+
+    def show_status(self):
+        self.help_text.configure(text=self.game.message)
+        if self.game.ai_to_move:
+            self.ai_job = self.after(self.ai_delay, self.ai_turn)
+
+    def stop(self):
+        if self.ai_job is not None:
+            self.after_cancel(self.ai_job)
+            self.ai_job = None
+        if self.game is not None:
+            self.game.close()
+
+    def save_game(self, path):
+        self.game.save(path)
+
+    def save_dialog(self):
+        from tkinter import filedialog
+
+        path = filedialog.asksaveasfilename(
+            parent=self, title='Save game', filetypes=[('Replays', '*.bsr')], defaultextension='.bsr'
+        )
+        if path:
+            self.save_game(path)
+
+    def load_game(self, path):
+        self.show_game(GameController.load(path, self.strategy))
+
+    @metrics.timed('battleship.ai_turn')
+    def ai_turn(self):
+        self.ai_job = None
+        metrics.count('battleship.ai_turns')
+        with metrics.timer('battleship.ai_shot'):
+            _, _, _, changes = self.game.ai_shot()
+        self.user_board.apply(changes)
+        self.show_status()
+
+    def cell_clicked(self, row, col, button):
+        if self.ai_job is not None:
+            return
+        try:
+            _, changes = self.game.user_shot(row, col)
+        except ValueError:
+            return
+        self.ai_board.apply(changes)
+        self.show_status()
 
 
 def configure(frame):
@@ -133,9 +327,25 @@ def configure(frame):
     frame.resizable(height=False, width=False)
 
 
-if __name__ == '__main__':
+def main():
+    parser = argparse.ArgumentParser(description='Battleship on a Tk canvas')
+    parser.add_argument('--size', type=int, default=BOARD_SIZE)
+    parser.add_argument('--ships', type=parse_ship_lengths, default=SHIP_LENGTHS, help='comma separated ship lengths')
+    parser.add_argument('--strategy', default=DEFAULT_STRATEGY, help=f'one of {", ".join(STRATEGIES)} or module:Class')
+    parser.add_argument('--startup-check', action='store_true', help='show the first screen and exit')
+    args = parser.parse_args()
+
     root = tkinter.Tk()
     configure(root)
-    Field(root).grid(row=0, column=0)
-    Field(root).grid(row=0, column=1)
+    root_widget = RootWidget(root, size=args.size, ship_lengths=args.ships, strategy=args.strategy)
+    root_widget.pack()
+    root_widget.start_placement()
+    if args.startup_check:
+        root.update()
+        root.destroy()
+        return
     root.mainloop()
+
+
+if __name__ == '__main__':
+    main()
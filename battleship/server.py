@@ -0,0 +1,311 @@
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from strategies import DEFAULT_STRATEGY, STRATEGIES, load_strategy
+from models import BOARD_SIZE, Field, FleetGenerator, ShotResult
+
+# Line protocol, one command per line.
+#
+# client -> server
+#   NEW AI [strategy]    play against a server-side AI
+#   NEW PVP              wait for another human
+#   NEW AUTO [strategy]  watch two AIs play each other
+#   S <row> <col>        shoot, only after TURN
+#   Q                    close the connection
+#
+# server -> client
+#   WAIT                 waiting for an opponent
+#   START <fleet>        match started, <fleet> is the hex encoded fleet of the player
+#   TURN                 your move
+#   R <Y|O> <row> <col> <m|h|k>   result of your (Y) or the opponent's (O) shot
+#   END <W|L>            match is over
+#   ERR <message>
+
+OUTGOING_QUEUE = 64
+
+
+class Player:
+    async def start(self, fleet):
+        pass
+
+    async def next_shot(self):
+        raise NotImplementedError
+
+    async def send(self, line):
+        pass
+
+    def shot_result(self, row, col, result):
+        pass
+
+    def interrupt(self):
+        pass
+
+
+class AIPlayer(Player):
+    # Moves are computed on the server's executor, so a slow strategy only
+    # holds one of the AI slots and never the event loop.
+    def __init__(self, strategy, slots, executor, observer=None):
+        self.ai = load_strategy(strategy)()
+        self.slots = slots
+        self.executor = executor
+        self.observer = observer
+
+    async def start(self, fleet):
+        if self.observer:
+            await self.observer.start(fleet)
+
+    async def send(self, line):
+        if self.observer:
+            await self.observer.send(line)
+
+    async def next_shot(self):
+        loop = asyncio.get_running_loop()
+        async with self.slots:
+            return await loop.run_in_executor(self.executor, self.ai.next_shot)
+
+    def shot_result(self, row, col, result):
+        self.ai.update(row, col, result)
+
+
+class Client(Player):
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.outgoing = asyncio.Queue(OUTGOING_QUEUE)
+        self.shots = asyncio.Queue(1)
+        self.match = None
+        self.turn = False
+        self.closed = False
+
+    async def send(self, line):
+        # A slow reader fills the queue and stalls its own match rather than
+        # the server. Once closed, lines are dropped.
+        if not self.closed:
+            await self.outgoing.put(line)
+
+    def _discard_outgoing(self):
+        # Also wakes a match blocked in send on a full queue.
+        while not self.outgoing.empty():
+            self.outgoing.get_nowait()
+
+    async def write_loop(self):
+        try:
+            while True:
+                line = await self.outgoing.get()
+                if line is None:
+                    break
+                self.writer.write(line.encode() + b'\n')
+                if self.outgoing.empty():
+                    await self.writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.closed = True
+            self._discard_outgoing()
+            self.writer.close()
+
+    async def start(self, fleet):
+        while not self.shots.empty():
+            self.shots.get_nowait()
+        await self.send(f'START {fleet.hex()}')
+
+    async def next_shot(self):
+        self.turn = True
+        try:
+            await self.send('TURN')
+            return await self.shots.get()
+        finally:
+            self.turn = False
+
+    def take_shot(self, shot):
+        # Only the one shot the match is waiting for is accepted.
+        if not self.turn or self.shots.full():
+            return False
+        self.shots.put_nowait(shot)
+        return True
+
+    def interrupt(self):
+        while not self.shots.empty():
+            self.shots.get_nowait()
+        self.shots.put_nowait(None)
+
+    def close(self):
+        self.closed = True
+        self.interrupt()
+        if self.match is not None:
+            self.match.leave(self)
+        self._discard_outgoing()
+        self.outgoing.put_nowait(None)
+
+
+class Match:
+    def __init__(self, players, seed=None):
+        generator = FleetGenerator(seed)
+        self.fleets = [generator.fleet(), generator.fleet()]
+        self.fields = [Field.from_fleet(fleet) for fleet in self.fleets]
+        self.players = players
+        self.left = None
+
+    def leave(self, player):
+        # The other player wins, even one waiting for its own turn.
+        if self.left is None:
+            self.left = player
+        for other in self.players:
+            other.interrupt()
+
+    async def run(self):
+        for player, fleet in zip(self.players, self.fleets):
+            await player.start(fleet)
+
+        turn = 0
+        while True:
+            shooter, target = self.players[turn], self.players[1 - turn]
+            shot = await shooter.next_shot() if self.left is None else None
+            if shot is None or self.left is not None:
+                winner = target if self.left in (None, shooter) else shooter
+                await winner.send('END W')
+                return
+            row, col = shot
+
+            field = self.fields[1 - turn]
+            if field.mark(row, col):
+                await shooter.send('ERR cell already shot')
+                continue
+            result = field.shot(row, col)
+            shooter.shot_result(row, col, result)
+            await shooter.send(f'R Y {row} {col} {result.value}')
+            await target.send(f'R O {row} {col} {result.value}')
+
+            if result == ShotResult.miss:
+                turn = 1 - turn
+            elif field.empty:
+                await shooter.send('END W')
+                await target.send('END L')
+                return
+
+
+class Server:
+    def __init__(self, ai_slots=64, match_slots=1024):
+        self.ai_slots = asyncio.Semaphore(ai_slots)
+        self.executor = ThreadPoolExecutor(ai_slots, thread_name_prefix='ai')
+        self.match_slots = asyncio.Semaphore(match_slots)
+        self.waiting = None
+        self.tasks = set()
+
+    def spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def play(self, match, *clients):
+        try:
+            async with self.match_slots:
+                await match.run()
+        finally:
+            for client in clients:
+                client.match = None
+
+    async def start_match(self, client, mode, strategy):
+        if mode == 'AI':
+            match = Match([client, AIPlayer(strategy, self.ai_slots, self.executor)])
+            clients = [client]
+        elif mode == 'AUTO':
+            match = Match([
+                AIPlayer(strategy, self.ai_slots, self.executor, client),
+                AIPlayer(strategy, self.ai_slots, self.executor),
+            ])
+            clients = [client]
+        elif mode == 'PVP':
+            if self.waiting is None or self.waiting.closed:
+                self.waiting = client
+                await client.send('WAIT')
+                return
+            match = Match([self.waiting, client])
+            clients = [self.waiting, client]
+            self.waiting = None
+        else:
+            await client.send(f'ERR unknown mode {mode}')
+            return
+
+        for _client in clients:
+            _client.match = match
+        self.spawn(self.play(match, *clients))
+
+    async def handle_line(self, client, line):
+        command, *args = line.split()
+        if command == 'NEW' and args:
+            if client.match is not None or self.waiting is client:
+                await client.send('ERR already playing')
+                return
+            strategy = args[1] if len(args) > 1 else DEFAULT_STRATEGY
+            if strategy not in STRATEGIES:
+                await client.send(f'ERR unknown strategy {strategy}')
+                return
+            await self.start_match(client, args[0].upper(), strategy)
+        elif command == 'S' and len(args) == 2:
+            try:
+                row, col = int(args[0]), int(args[1])
+            except ValueError:
+                row = col = -1
+            if not (0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE):
+                await client.send('ERR bad cell')
+                return
+            if client.match is None:
+                await client.send('ERR not playing')
+                return
+            if not client.take_shot((row, col)):
+                await client.send('ERR not your turn')
+        elif command == 'Q':
+            raise ConnectionResetError
+        else:
+            await client.send(f'ERR bad command {command}')
+
+    async def handle(self, reader, writer):
+        client = Client(reader, writer)
+        writer_task = self.spawn(client.write_loop())
+        try:
+            while not client.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.decode(errors='replace').strip()
+                if line:
+                    await self.handle_line(client, line)
+        except ConnectionError:
+            pass
+        finally:
+            if self.waiting is client:
+                self.waiting = None
+            client.close()
+            await writer_task
+
+
+async def serve(host, port, ai_slots, match_slots):
+    server = Server(ai_slots, match_slots)
+    listener = await asyncio.start_server(server.handle, host, port, backlog=4096)
+    print(f'listening on {", ".join(str(sock.getsockname()) for sock in listener.sockets)}')
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Battleship match server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--ai-slots', type=int, default=64, help='concurrent AI move computations')
+    parser.add_argument('--match-slots', type=int, default=1024, help='concurrently running matches')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.ai_slots, args.match_slots))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import os
+import statistics
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+from strategies import DEFAULT_STRATEGY, STRATEGIES, load_strategy
+from models import BOARD_SIZE, SHIP_LENGTHS, Field, FleetGenerator, ShotResult, parse_ship_lengths
+from replay import ReplayWriter, ShotLog
+
+
+def play(seed, strategies, size=BOARD_SIZE, ship_lengths=SHIP_LENGTHS, first=0):
+    generator = FleetGenerator(seed, ship_lengths, size=size)
+    fleets = (generator.fleet(), generator.fleet())
+    fields = [Field.from_fleet(fleet, size, ship_lengths) for fleet in fleets]
+    players = [
+        load_strategy(name)(seed * 2 + number, ship_lengths, size) for number, name in enumerate(strategies)
+    ]
+    shots = [0, 0]
+    decisions = [[0.0, 0], [0.0, 0]]
+    history = ShotLog(size)
+
+    turn = first
+    while True:
+        start = time.perf_counter()
+        row, col = players[turn].next_shot()
+        decisions[turn][0] += time.perf_counter() - start
+        decisions[turn][1] += 1
+        result = fields[1 - turn].shot(row, col)
+        start = time.perf_counter()
+        players[turn].update(row, col, result)
+        decisions[turn][0] += time.perf_counter() - start
+        shots[turn] += 1
+        history.add(row, col, result)
+
+        if result == ShotResult.miss:
+            turn = 1 - turn
+        elif result == ShotResult.kill and fields[1 - turn].empty:
+            record = history.game(fleets, first, ship_lengths).to_bytes()
+            return turn, shots[turn], record, decisions
+
+
+def play_game(task):
+    seed, strategies, size, ship_lengths = task
+    return play(seed, strategies, size, ship_lengths, seed % 2)
+
+
+def report(names, results, elapsed):
+    games = len(results)
+    print(f'{games} games in {elapsed:.2f}s, {games / elapsed:.1f} games/sec')
+
+    wins = Counter(winner for winner, _, _, _ in results)
+    for number, name in enumerate(names):
+        seconds = sum(decisions[number][0] for _, _, _, decisions in results)
+        moves = sum(decisions[number][1] for _, _, _, decisions in results)
+        print(
+            f'player {number + 1} ({name}): {wins[number]} wins, {wins[number] / games:.1%}, '
+            f'{seconds / moves * 1e6:.1f} us per move'
+        )
+
+    shots = sorted(shots for _, shots, _, _ in results)
+    quantiles = statistics.quantiles(shots, n=100) if len(shots) > 1 else shots * 99
+    print(
+        f'shots to win: mean {statistics.mean(shots):.2f}, min {shots[0]}, '
+        f'p10 {quantiles[9]:.0f}, p50 {quantiles[49]:.0f}, p90 {quantiles[89]:.0f}, max {shots[-1]}'
+    )
+
+    step = max(10, (shots[-1] - shots[0]) // 200 * 10)
+    buckets = Counter(value // step * step for value in shots)
+    width = max(buckets.values())
+    for bucket in sorted(buckets):
+        bar = '#' * max(1, buckets[bucket] * 50 // width)
+        print(f'{bucket:>3}-{bucket + step - 1:<3} {buckets[bucket]:>8} {bar}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play AI-vs-AI battleship games without a GUI')
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--strategy', choices=STRATEGIES, default=DEFAULT_STRATEGY)
+    parser.add_argument('--opponent', choices=STRATEGIES, default=None)
+    parser.add_argument('--replay', metavar='PATH', help='append every game to a replay file')
+    parser.add_argument('--size', type=int, default=BOARD_SIZE)
+    parser.add_argument('--ships', type=parse_ship_lengths, default=SHIP_LENGTHS, help='comma separated ship lengths')
+    args = parser.parse_args()
+
+    names = (args.strategy, args.opponent or args.strategy)
+    tasks = [(args.seed + number, names, args.size, args.ships) for number in range(args.games)]
+    chunksize = max(1, args.games // (args.workers * 16))
+
+    start = time.perf_counter()
+    with Pool(args.workers) as pool:
+        results = list(pool.imap_unordered(play_game, tasks, chunksize=chunksize))
+    report(names, results, time.perf_counter() - start)
+
+    if args.replay:
+        with ReplayWriter(args.replay) as writer:
+            for _, _, record, _ in results:
+                writer.write(record)
+
+
+if __name__ == '__main__':
+    main()
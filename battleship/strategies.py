@@ -0,0 +1,21 @@
+from functools import partial
+
+from gamekit import registry
+
+# A battleship strategy is a class built as Strategy(seed=None, ship_lengths=SHIP_LENGTHS, size=BOARD_SIZE)
+# with two methods:
+#   next_shot()                 -> (row, col) of the next cell to shoot
+#   update(row, col, result)    the ShotResult of that shot
+# and optionally
+#   ponder(stop, budget)        work towards the next shot on a background thread
+#                               until stop (a threading.Event) is set or budget
+#                               seconds of CPU are spent, without changing it
+# Names are resolved by gamekit.registry.
+STRATEGIES = {
+    'random': 'ai:RandomAI',
+    'probability': 'ai:ProbabilityAI',
+    'posterior': 'posterior:PosteriorAI',
+}
+DEFAULT_STRATEGY = 'probability'
+
+load_strategy = partial(registry.load, STRATEGIES)
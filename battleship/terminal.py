@@ -0,0 +1,177 @@
+import argparse
+import curses
+import os
+
+from controller import AI, USER, GameController, PlacementController
+from models import BOARD_SIZE, SHIP_LENGTHS, parse_ship_lengths
+from strategies import DEFAULT_STRATEGY, STRATEGIES
+
+AI_DELAY = int(os.environ.get('BATTLESHIP_AI_DELAY', 1000))
+
+MOVES = {
+    curses.KEY_UP: (-1, 0), curses.KEY_DOWN: (1, 0), curses.KEY_LEFT: (0, -1), curses.KEY_RIGHT: (0, 1),
+    ord('k'): (-1, 0), ord('j'): (1, 0), ord('h'): (0, -1), ord('l'): (0, 1),
+}
+SELECT = {ord(' '), ord('\n'), curses.KEY_ENTER}
+
+PLACEMENT_HELP = 'arrows/hjkl move, space place or rotate, d delete, r randomize, u undo, y redo, s start, q quit'
+BATTLE_HELP = 'arrows/hjkl move, space fire, w save, n new game, q quit'
+
+
+def visible_range(cursor, size, visible):
+    start = min(max(0, cursor - visible // 2), size - visible)
+    return range(start, start + visible)
+
+
+def draw_board(screen, top, left, height, width, title, size, text, cursor=None):
+    # Two columns per cell. Boards larger than the terminal scroll with the cursor.
+    screen.addnstr(top, left, title, width)
+    rows = min(size, height - 1)
+    cols = min(size, width // 2)
+    if rows <= 0 or cols <= 0:
+        return
+    cursor_row, cursor_col = cursor or (0, 0)
+    for y, row in enumerate(visible_range(cursor_row, size, rows)):
+        for x, col in enumerate(visible_range(cursor_col, size, cols)):
+            attr = curses.A_REVERSE if (row, col) == cursor else curses.A_NORMAL
+            screen.addstr(top + 1 + y, left + 2 * x, text(row, col) or '-', attr)
+
+
+class TerminalGame:
+    def __init__(self, screen, size=BOARD_SIZE, ship_lengths=SHIP_LENGTHS, save_path='battleship.bsr',
+                 ai_delay=AI_DELAY, strategy=DEFAULT_STRATEGY):
+        self.screen = screen
+        self.strategy = strategy
+        self.placement = PlacementController(size, ship_lengths)
+        self.game = None
+        self.save_path = save_path
+        self.ai_delay = ai_delay
+        self.cursor = (0, 0)
+        self.message = 'Place your ships.'
+
+    @property
+    def size(self):
+        return self.game.size if self.game else self.placement.size
+
+    def user_text(self, row, col):
+        ship = self.game.fields[USER].covering_ship(row, col)
+        return self.game.mark(USER, row, col) or (str(ship.length) if ship else '')
+
+    def render(self):
+        screen = self.screen
+        screen.erase()
+        height, width = screen.getmaxyx()
+        screen.addnstr(0, 0, self.message, width - 1)
+        screen.addnstr(1, 0, BATTLE_HELP if self.game else PLACEMENT_HELP, width - 1, curses.A_DIM)
+
+        board_height = height - 3
+        if self.game is None:
+            draw_board(screen, 3, 0, board_height, width - 1, 'Your fleet', self.size, self.placement.text, self.cursor)
+        else:
+            half = (width - 1) // 2
+            draw_board(screen, 3, 0, board_height, half - 2, 'Your fleet', self.size, self.user_text)
+            draw_board(
+                screen, 3, half, board_height, half, 'Enemy', self.size,
+                lambda row, col: self.game.mark(AI, row, col), self.cursor,
+            )
+        screen.refresh()
+
+    def start_battle(self):
+        if not self.placement.ready:
+            self.message = 'Place all ships first.'
+            return
+        self.close_game()
+        self.game = GameController(self.placement.field, strategy=self.strategy)
+        self.cursor = (0, 0)
+        self.message = self.game.message
+
+    def close_game(self):
+        if self.game is not None:
+            self.game.close()
+            self.game = None
+
+    def new_game(self):
+        self.close_game()
+        self.placement.reset()
+        self.cursor = (0, 0)
+        self.message = 'Place your ships.'
+
+    def load(self, path):
+        self.close_game()
+        self.game = GameController.load(path, self.strategy)
+        self.message = self.game.message
+
+    def ai_turn(self):
+        self.game.ai_shot()
+        self.message = self.game.message
+
+    def handle_key(self, key):
+        if key in MOVES:
+            x, y = MOVES[key]
+            row, col = self.cursor
+            self.cursor = (min(max(row + x, 0), self.size - 1), min(max(col + y, 0), self.size - 1))
+        elif self.game is None:
+            if key in SELECT:
+                self.placement.select(*self.cursor)
+            elif key == ord('d'):
+                self.placement.delete(*self.cursor)
+            elif key == ord('r'):
+                self.placement.randomize()
+            elif key == ord('u'):
+                self.placement.undo()
+            elif key == ord('y'):
+                self.placement.redo()
+            elif key == ord('s'):
+                self.start_battle()
+        elif key in SELECT:
+            try:
+                self.game.user_shot(*self.cursor)
+            except ValueError:
+                return
+            self.message = self.game.message
+        elif key == ord('w'):
+            self.game.save(self.save_path)
+            self.message = f'Saved to {self.save_path}'
+        elif key == ord('n'):
+            self.new_game()
+
+    def run(self, startup_check=False):
+        curses.curs_set(0)
+        while True:
+            self.render()
+            if startup_check:
+                return
+            ai_waiting = self.game is not None and self.game.ai_to_move
+            self.screen.timeout(self.ai_delay if ai_waiting else -1)
+            key = self.screen.getch()
+            if key == -1:
+                if ai_waiting:
+                    self.ai_turn()
+                continue
+            if key == ord('q'):
+                return
+            self.handle_key(key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Battleship in the terminal')
+    parser.add_argument('--size', type=int, default=BOARD_SIZE)
+    parser.add_argument('--ships', type=parse_ship_lengths, default=SHIP_LENGTHS, help='comma separated ship lengths')
+    parser.add_argument('--strategy', default=DEFAULT_STRATEGY, help=f'one of {", ".join(STRATEGIES)} or module:Class')
+    parser.add_argument('--load', metavar='PATH', help='continue a saved game')
+    parser.add_argument('--save', metavar='PATH', default='battleship.bsr', help='where w saves the game')
+    parser.add_argument('--startup-check', action='store_true', help='draw the first screen and exit')
+    args = parser.parse_args()
+
+    def run(screen):
+        game = TerminalGame(screen, args.size, args.ships, args.save, strategy=args.strategy)
+        if args.load:
+            game.load(args.load)
+        game.run(args.startup_check)
+        game.close_game()
+
+    curses.wrapper(run)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+from controller import GameController, PlacementController
+from models import Direction, Field
+
+
+def test_placement_undo_and_redo():
+    placement = PlacementController(6, (3, 1))
+    assert sorted(placement.select(0, 0)) == [(0, 0, '3'), (0, 1, '3'), (0, 2, '3')]
+    placement.select(4, 4)
+    assert placement.ready
+    placed = placement.state
+
+    assert sorted(placement.undo()) == [(4, 4, '')]
+    assert not placement.ready and placement.can_redo
+    assert placement.redo() == [(4, 4, '1')]
+    assert placement.state is placed and not placement.can_redo
+
+    # Selecting a ship rotates it; a new edit drops the redo history.
+    placement.undo()
+    assert sorted(placement.select(0, 0)) == [(0, 0, '3'), (0, 1, ''), (0, 2, ''), (1, 0, '3'), (2, 0, '3')]
+    assert not placement.can_redo
+    assert placement.undo() and placement.undo() and placement.state.occupied == 0
+    assert placement.undo() == []
+
+
+def test_placement_refuses_blocked_cells():
+    placement = PlacementController(6, (3, 1))
+    placement.select(0, 0)
+    assert placement.select(1, 1) == []
+    assert placement.preview(1, 1) == frozenset()
+    assert (1, 1) not in placement.valid_starts() and (3, 3) in placement.valid_starts()
+    assert sorted(placement.delete(0, 1)) == [(0, 0, ''), (0, 1, ''), (0, 2, '')]
+    assert placement.state.occupied == 0
+
+
+
+def test_game_messages():
+    user, enemy = Field(4, (1,)), Field(4, (1,))
+    user.place(user.ships[0], 0, 0, Direction.horizontal)
+    enemy.place(enemy.ships[0], 3, 3, Direction.horizontal)
+    game = GameController(user, enemy, seed=0, strategy='random')
+    assert game.message == 'Your turn' and not game.ai_to_move
+
+    game.user_shot(0, 0)
+    assert game.message == 'You miss. AI turn' and game.ai_to_move
+    row, col, _, _ = game.ai_shot()
+    if (row, col) == (0, 0):
+        assert game.message == 'You lose' and not game.ai_to_move
+    else:
+        assert game.message == 'You are lucky. AI miss. Your turn' and not game.ai_to_move
+        game.user_shot(3, 3)
+        assert game.message == 'You win' and game.finished
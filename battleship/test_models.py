@@ -0,0 +1,257 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from models import (
+    Direction, Field, FieldState, FleetGenerator, ShotResult, cell_bit, encode_placement, nth_bit,
+    placement_coordinates, placement_masks, unpack_fleet, valid_placements,
+)
+
+
+def touches(cells, others):
+    return any(abs(row - other_row) <= 1 and abs(col - other_col) <= 1
+               for row, col in cells for other_row, other_col in others)
+
+
+def brute_force_placements(field, ship):
+    # Placements on the board whose cells keep clear of every other ship.
+    others = [cell for other in field.ships if other is not ship for cell in other.coordinates]
+    placements = set()
+    for row in range(field.size):
+        for col in range(field.size):
+            for direction in Direction:
+                if ship.length == 1 and direction == Direction.vertical:
+                    continue
+                cells = placement_coordinates(ship.length, row, col, direction)
+                if all(r < field.size and c < field.size for r, c in cells) and not touches(cells, others):
+                    placements.add((row, col, direction))
+    return placements
+
+
+def random_field(seed, size=8, ship_lengths=(4, 3, 2, 2, 1)):
+    # A field with some of its ships placed at random legal spots.
+    rng = random.Random(seed)
+    field = Field(size, ship_lengths)
+    for ship in field.ships:
+        options = sorted(field.valid_placements(ship), key=lambda placement: placement[:2])
+        if options and rng.random() < 0.7:
+            field.place(ship, *rng.choice(options))
+    return field
+
+
+def test_place_sets_cells():
+    field = Field()
+    ship = field.ships[0]
+    assert field.place(ship, 2, 3, Direction.vertical) == {(2, 3), (3, 3), (4, 3), (5, 3)}
+    assert field.occupied == sum(cell_bit(row, 3) for row in range(2, 6))
+    assert field.covering_ship(4, 3) is ship
+    assert field.covering_ship(6, 3) is None
+
+
+@pytest.mark.parametrize('row, col', [(0, 3), (1, 3), (1, 0), (0, 1)])
+def test_place_rejects_touching_ships(row, col):
+    field = Field()
+    field.place(field.ships[1], 0, 0, Direction.horizontal)
+    with pytest.raises(ValueError):
+        field.place(field.ships[6], row, col, Direction.horizontal)
+    assert not field.ships[6].placed
+
+
+@pytest.mark.parametrize('row, col, direction', [
+    (0, 7, Direction.horizontal), (7, 0, Direction.vertical), (10, 0, Direction.horizontal),
+])
+def test_place_rejects_leaving_the_board(row, col, direction):
+    field = Field()
+    with pytest.raises(ValueError):
+        field.place(field.ships[0], row, col, direction)
+    assert not field.can_place(field.ships[0], row, col, direction)
+
+
+def test_moving_a_ship_ignores_its_own_halo():
+    field = Field()
+    ship = field.ships[0]
+    field.place(ship, 0, 0, Direction.horizontal)
+    field.place(ship, 1, 0, Direction.horizontal)
+    assert ship.coordinates == {(1, 0), (1, 1), (1, 2), (1, 3)}
+    assert field.occupied == sum(cell_bit(1, col) for col in range(4))
+
+
+def test_unplace_frees_blocked_cells():
+    field = Field()
+    first, second = field.ships[0], field.ships[6]
+    field.place(first, 0, 0, Direction.horizontal)
+    assert not field.can_place(second, 1, 4, Direction.horizontal)
+    field.unplace(first)
+    assert field.occupied == 0 and field.blocked == 0
+    assert field.can_place(second, 1, 4, Direction.horizontal)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_valid_placements_match_brute_force(seed):
+    field = random_field(seed)
+    for ship in field.ships:
+        expected = brute_force_placements(field, ship)
+        assert set(field.valid_placements(ship)) == expected
+        for row in range(field.size):
+            for col in range(field.size):
+                for direction in Direction:
+                    if ship.length > 1 or direction == Direction.horizontal:
+                        assert field.can_place(ship, row, col, direction) == ((row, col, direction) in expected)
+
+
+def test_shots_reveal_sunk_ship_halo():
+    field = Field(6, (2, 1))
+    field.place(field.ships[0], 0, 0, Direction.horizontal)
+    field.place(field.ships[1], 4, 4, Direction.horizontal)
+
+    assert field.shot(3, 0) == ShotResult.miss
+    assert field.shot(0, 0) == ShotResult.hit
+    assert field.mark(0, 0) == ShotResult.hit and field.mark(1, 1) is None
+    result, marks = field.fire(0, 1)
+    assert result == ShotResult.kill
+    assert {(row, col) for row, col, _ in marks} == {(0, 1), (0, 2), (1, 0), (1, 1), (1, 2)}
+    assert all(mark == ShotResult.miss for row, col, mark in marks if (row, col) != (0, 1))
+    assert not field.empty
+    assert field.shot(4, 4) == ShotResult.kill
+    assert field.empty
+
+
+def test_ship_methods_keep_the_field_in_step():
+    field = Field(6, (2, 1))
+    first, second = field.ships
+    first.place(0, 0, Direction.horizontal)
+    second.place(4, 4, Direction.horizontal)
+    assert field.occupied == cell_bit(0, 0, 6) | cell_bit(0, 1, 6) | cell_bit(4, 4, 6)
+    assert not field.can_place(second, 1, 2, Direction.horizontal)
+
+    for row, col in [(0, 0), (0, 1), (4, 4)]:
+        (first if row == 0 else second).shot(row, col)
+    assert field.empty
+    assert field.mark(1, 2) == ShotResult.miss
+
+    second.unplace()
+    assert field.occupied == cell_bit(0, 0, 6) | cell_bit(0, 1, 6)
+    assert field.blocked == first.halo
+
+
+def test_bytes_round_trip():
+    field = random_field(3, size=10, ship_lengths=(4, 3, 3, 2))
+    for row, col in [(0, 0), (5, 5), (9, 9)]:
+        field.shot(row, col)
+    copy = Field.from_bytes(field.to_bytes(), field.size, field.ship_lengths)
+    assert copy.fleet() == field.fleet()
+    for name in ('occupied', 'blocked', 'hits', 'misses', 'revealed'):
+        assert getattr(copy, name) == getattr(field, name)
+
+
+def all_fleets(size, ship_lengths):
+    fleets = []
+
+    def extend(codes, blocked):
+        if len(codes) == len(ship_lengths):
+            fleets.append(tuple(codes))
+            return
+        length = ship_lengths[len(codes)]
+        for row, col, direction in valid_placements(length, blocked, size):
+            _, halo = placement_masks(length, row, col, direction, size)
+            extend(codes + [encode_placement(row, col, direction, size)], blocked | halo)
+
+    extend([], 0)
+    return fleets
+
+
+def test_nth_bit():
+    rng = random.Random(0)
+    for width in (1, 60, 64, 65, 300, 5000):
+        mask = rng.getrandbits(width) | 1
+        bits = [index for index in range(mask.bit_length()) if mask >> index & 1]
+        for number in rng.sample(range(len(bits)), min(len(bits), 20)):
+            assert nth_bit(mask, number) == bits[number]
+    with pytest.raises(ValueError):
+        nth_bit(0b101, 2)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_generated_fleets_are_legal(seed):
+    generator = FleetGenerator(seed)
+    for _ in range(50):
+        field = Field.from_fleet(generator.fleet())
+        assert all(ship.placed for ship in field.ships)
+
+
+def test_fleets_repeat_for_a_seed():
+    assert FleetGenerator(7).fleets(20) == FleetGenerator(7).fleets(20)
+    assert FleetGenerator(7).fleets(20) != FleetGenerator(8).fleets(20)
+
+
+def test_fleet_that_does_not_fit():
+    with pytest.raises(ValueError):
+        FleetGenerator(0, (3, 3, 3), size=3, max_attempts=10).fleet()
+
+
+def test_fleets_are_uniform():
+    # Chi-squared against every legal layout of a small fleet; the bound is
+    # five standard deviations above the mean of the distribution.
+    size, ship_lengths, count = 4, (2, 1, 1), 20000
+    fleets = all_fleets(size, ship_lengths)
+    generator = FleetGenerator(0, ship_lengths, size=size)
+    seen = Counter(tuple(unpack_fleet(generator.fleet(), size)) for _ in range(count))
+    assert set(seen) <= set(fleets)
+
+    expected = count / len(fleets)
+    chi_squared = sum((seen[fleet] - expected) ** 2 / expected for fleet in fleets)
+    freedom = len(fleets) - 1
+    assert chi_squared < freedom + 5 * math.sqrt(2 * freedom)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_field_state_round_trip(seed):
+    field = random_field(seed)
+    for row, col in [(0, 0), (3, 4), (7, 7)]:
+        field.shot(row, col)
+    state = field.snapshot()
+    copy = state.to_field()
+    assert copy.fleet() == field.fleet() == state.fleet()
+    for name in ('occupied', 'blocked', 'hits', 'misses', 'revealed'):
+        assert getattr(copy, name) == getattr(field, name)
+    assert FieldState.from_field(copy) == state
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_field_state_placements_match_field(seed):
+    field = random_field(seed)
+    state = field.snapshot()
+    for index, ship in enumerate(field.ships):
+        assert set(state.valid_placements(index)) == set(field.valid_placements(ship))
+        for row, col in [(0, 0), (4, 4), (7, 6), (2, 5)]:
+            for direction in Direction:
+                assert state.can_place(index, row, col, direction) == field.can_place(ship, row, col, direction)
+
+
+def test_field_state_edits_leave_the_original_alone():
+    empty = FieldState.empty(6, (3, 1))
+    placed = empty.place(0, 0, 0, Direction.horizontal)
+    assert empty.placements == (None, None) and empty.occupied == 0
+    assert placed.coordinates(0) == {(0, 0), (0, 1), (0, 2)}
+    assert placed.next_unplaced() == 1
+
+    with pytest.raises(ValueError):
+        placed.place(1, 1, 3, Direction.horizontal)
+
+    rotated = placed.rotate(0)
+    assert rotated.coordinates(0) == {(0, 0), (1, 0), (2, 0)}
+    assert placed.coordinates(0) == {(0, 0), (0, 1), (0, 2)}
+    assert rotated.occupied == sum(cell_bit(row, 0, 6) for row in range(3))
+    assert rotated.unplace(0).occupied == 0
+
+
+def test_field_state_shots():
+    state = FieldState.empty(6, (2,)).place(0, 2, 2, Direction.vertical)
+    state, result = state.shot(0, 0)
+    assert result == ShotResult.miss
+    state, result = state.shot(2, 2)
+    assert result == ShotResult.hit and not state.finished
+    state, result = state.shot(3, 2)
+    assert result == ShotResult.kill and state.finished
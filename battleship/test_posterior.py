@@ -0,0 +1,103 @@
+import pytest
+
+from models import Direction, Field, ShotResult, placement_masks, valid_placements
+from posterior import Observations, PosteriorSampler
+
+SIZE = 5
+SHIP_LENGTHS = (3, 2, 1)
+FLEET = ((0, 0, Direction.horizontal), (2, 1, Direction.vertical), (4, 4, Direction.horizontal))
+
+
+def fleets(size=SIZE, ship_lengths=SHIP_LENGTHS):
+    # Every legal layout as a tuple of ship masks.
+    layouts = []
+
+    def extend(masks, blocked):
+        if len(masks) == len(ship_lengths):
+            layouts.append(tuple(masks))
+            return
+        length = ship_lengths[len(masks)]
+        for placement in valid_placements(length, blocked, size):
+            mask, halo = placement_masks(length, *placement, size)
+            extend(masks + [mask], blocked | halo)
+
+    extend([], 0)
+    return layouts
+
+
+def consistent(masks, observations):
+    sunk = set(observations.sunk)
+    occupied = alive = 0
+    for mask in masks:
+        occupied |= mask
+        if mask not in sunk:
+            alive |= mask
+    return (
+        sunk <= set(masks)
+        and not occupied & observations.empty
+        and not observations.hits & ~alive
+        # A ship with every cell hit would have been reported sunk.
+        and all(mask & ~observations.hits for mask in masks if mask not in sunk)
+    )
+
+
+def exact_probabilities(observations):
+    matching = [masks for masks in fleets() if consistent(masks, observations)]
+    counts = [0] * (SIZE * SIZE)
+    for masks in matching:
+        for mask in masks:
+            for index in range(SIZE * SIZE):
+                counts[index] += mask >> index & 1
+    return [count / len(matching) for count in counts]
+
+
+def observe(shots):
+    field = Field(SIZE, SHIP_LENGTHS)
+    for ship, placement in zip(field.ships, FLEET):
+        field.place(ship, *placement)
+    results = [field.shot(row, col) for row, col in shots]
+    return Observations.from_field(field), results
+
+
+@pytest.mark.parametrize('shots', [
+    [],
+    [(1, 1), (3, 3)],
+    [(2, 1), (0, 4)],
+    [(4, 4), (2, 1), (2, 3)],
+    [(0, 0), (0, 1), (0, 2), (3, 1)],
+])
+def test_matches_exact_posterior(shots):
+    observations, _ = observe(shots)
+    expected = exact_probabilities(observations)
+    probabilities = PosteriorSampler(observations, SHIP_LENGTHS, SIZE, seed=0).run(20000).probabilities()
+    for index, (estimate, exact) in enumerate(zip(probabilities, expected)):
+        assert estimate == pytest.approx(exact, abs=0.03), divmod(index, SIZE)
+
+
+def test_known_cells():
+    observations, results = observe([(0, 0), (0, 1), (0, 2), (2, 1), (1, 4)])
+    assert results == [ShotResult.hit, ShotResult.hit, ShotResult.kill, ShotResult.hit, ShotResult.miss]
+    probabilities = PosteriorSampler(observations, SHIP_LENGTHS, SIZE, seed=0).run(200).probabilities()
+    for row, col in [(0, 0), (0, 1), (0, 2), (2, 1)]:
+        assert probabilities[row * SIZE + col] == 1.0
+    # Misses and the cells around the sunk ship hold nothing.
+    for row, col in [(1, 4), (1, 0), (1, 3), (0, 3)]:
+        assert probabilities[row * SIZE + col] == 0.0
+
+
+def test_runs_continue_the_same_stream():
+    observations, _ = observe([(1, 1), (2, 1)])
+    whole = PosteriorSampler(observations, SHIP_LENGTHS, SIZE, seed=5).run(300)
+    parts = PosteriorSampler(observations, SHIP_LENGTHS, SIZE, seed=5)
+    for count in (1, 99, 200):
+        parts.run(count)
+    assert parts.samples == whole.samples == 300
+    assert parts.probabilities() == whole.probabilities()
+
+
+def test_inconsistent_observations():
+    with pytest.raises(ValueError):
+        PosteriorSampler(Observations(0, 0, (0b111, 0b111 << 10)), SHIP_LENGTHS, SIZE).run(1)
+    everything = (1 << SIZE * SIZE) - 1
+    with pytest.raises(ValueError):
+        PosteriorSampler(Observations(0, everything, ()), SHIP_LENGTHS, SIZE).run(1)
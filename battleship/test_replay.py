@@ -0,0 +1,63 @@
+import pytest
+
+from models import FleetGenerator, ShotResult
+from replay import MAGIC, ReplayWriter, ShotLog, read_games
+
+
+def record(size, ship_lengths, shots, first=0, seed=0):
+    generator = FleetGenerator(seed, ship_lengths, size=size)
+    fleets = (generator.fleet(), generator.fleet())
+    log = ShotLog(size)
+    for row, col, result in shots:
+        log.add(row, col, result)
+    return log.game(fleets, first, ship_lengths)
+
+
+def play_out(game):
+    # Every ship cell of the second fleet shot in order, with a miss in between.
+    target = game.fields()[1]
+    shots = []
+    for ship in target.ships:
+        for row, col in sorted(ship.coordinates):
+            shots.append((row, col, target.shot(row, col)))
+    shots.insert(1, (0, 0, ShotResult.miss))
+    return shots
+
+
+@pytest.mark.parametrize('size, ship_lengths', [(10, (4, 3, 3, 2, 2, 2, 1, 1, 1, 1)), (20, (5, 4, 3)), (6, (2,))])
+def test_round_trip(tmp_path, size, ship_lengths):
+    shots = play_out(record(size, ship_lengths, []))
+    games = [record(size, ship_lengths, shots), record(size, ship_lengths, shots[:5], first=1, seed=1)]
+    path = tmp_path / 'games.bsr'
+    with ReplayWriter(path) as writer:
+        writer.write(games[0])
+    with ReplayWriter(path) as writer:
+        writer.write(games[1].to_bytes())
+
+    loaded = list(read_games(path))
+    assert loaded == games
+    players = [player for player, _, _, _ in loaded[0].moves()]
+    assert players[:3] == [0, 0, 1]
+    assert [move[1:] for move in loaded[0].moves()] == shots
+    assert [move[1:] for move in loaded[1].moves()] == shots[:5]
+    assert next(loaded[1].moves())[0] == 1
+    for game in loaded:
+        assert [field.fleet() for field in game.fields()] == list(game.fleets)
+
+
+def test_results_take_two_bits():
+    game = record(10, (2, 1), [(0, index, ShotResult.miss) for index in range(9)])
+    assert len(game.cells) == 9 and len(game.results) == 3
+    assert len(game.to_bytes()) == 7 + 2 + 2 * 2 + 9 + 3
+
+
+def test_bad_files(tmp_path):
+    path = tmp_path / 'games.bsr'
+    path.write_bytes(b'XXXX')
+    with pytest.raises(ValueError):
+        list(read_games(path))
+
+    game = record(10, (2, 1), [(1, 1, ShotResult.miss), (2, 2, ShotResult.hit)])
+    path.write_bytes(MAGIC + game.to_bytes()[:-1])
+    with pytest.raises(ValueError):
+        list(read_games(path))
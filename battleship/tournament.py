@@ -0,0 +1,35 @@
+import argparse
+import os
+
+from gamekit import ratings
+
+from models import BOARD_SIZE, SHIP_LENGTHS, parse_ship_lengths
+from simulate import play as play_match
+from strategies import STRATEGIES
+
+
+def play(task):
+    pair, seed, (size, ship_lengths) = task
+    winner, _, _, decisions = play_match(seed, pair, size, ship_lengths)
+    return winner, decisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Round-robin tournament between battleship strategies')
+    parser.add_argument('strategies', nargs='*', help=f'default: all of {", ".join(STRATEGIES)}')
+    parser.add_argument('--games', type=int, default=100, help='games per pairing')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--size', type=int, default=BOARD_SIZE)
+    parser.add_argument('--ships', type=parse_ship_lengths, default=SHIP_LENGTHS, help='comma separated ship lengths')
+    args = parser.parse_args()
+
+    names = args.strategies or list(STRATEGIES)
+    if len(names) < 2:
+        parser.error('a tournament needs at least two strategies')
+    standings, elapsed = ratings.tournament(play, names, args.games, args.seed, args.workers, (args.size, args.ships))
+    standings.report(elapsed)
+
+
+if __name__ == '__main__':
+    main()
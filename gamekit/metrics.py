@@ -0,0 +1,145 @@
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Opt-in timing histograms and counters shared by both games. Set GAME_METRICS
+# to a file path to switch recording on and dump everything there as JSON when
+# the process exits, or call enable() from code. While disabled every call
+# returns straight away.
+ENVIRONMENT = 'GAME_METRICS'
+
+
+class Histogram:
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        # Bucket n holds values below 2 ** n microseconds.
+        self.buckets = {}
+
+    def record(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        bucket = int(value * 1e6).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def quantile(self, fraction):
+        if not self.count:
+            return None
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= fraction * self.count:
+                return min(self.max, (1 << bucket) / 1e6)
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': {f'<{(1 << bucket)}us': count for bucket, count in sorted(self.buckets.items())},
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def record(self, name, value):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.record(value)
+
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def timer(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'histograms': {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())},
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def dump(self, path):
+        # json is only needed at exit, keep it off the startup path.
+        import json
+
+        with open(path, 'w') as file:
+            json.dump(self.snapshot(), file, indent=2)
+
+
+REGISTRY = Registry()
+record = REGISTRY.record
+count = REGISTRY.count
+timer = REGISTRY.timer
+timed = REGISTRY.timed
+snapshot = REGISTRY.snapshot
+reset = REGISTRY.reset
+dump = REGISTRY.dump
+
+
+def enable(path=None):
+    REGISTRY.enabled = True
+    if path:
+        atexit.register(REGISTRY.dump, path)
+
+
+def disable():
+    REGISTRY.enabled = False
+
+
+if os.environ.get(ENVIRONMENT):
+    enable(os.environ[ENVIRONMENT])
@@ -0,0 +1,112 @@
+import itertools
+import math
+import time
+from multiprocessing import Pool
+
+# Round-robin tournaments shared by both games. A game supplies play(task),
+# where task is ((first_name, second_name), seed, options) and the result is
+# (winner, decisions): winner is 0 or 1 for the side that won, None for a draw,
+# and decisions holds (seconds, moves) spent deciding by each side.
+
+
+def schedule(names, games, seed=0, options=None):
+    tasks = []
+    for pair in itertools.combinations(names, 2):
+        for number in range(games):
+            # Alternate the seats so neither strategy always moves first.
+            tasks.append((pair if number % 2 == 0 else pair[::-1], seed + number, options))
+    return tasks
+
+
+def run(play, tasks, workers=None):
+    with Pool(workers) as pool:
+        chunksize = max(1, len(tasks) // ((workers or 1) * 16))
+        return [
+            (task[0], *result)
+            for task, result in zip(tasks, pool.imap(play, tasks, chunksize=chunksize))
+        ]
+
+
+class Standings:
+    def __init__(self, names):
+        self.names = list(names)
+        self.score = {(a, b): 0.0 for a in self.names for b in self.names}
+        self.games = {(a, b): 0 for a in self.names for b in self.names}
+        self.record = {name: [0, 0, 0] for name in self.names}
+        self.seconds = {name: 0.0 for name in self.names}
+        self.moves = {name: 0 for name in self.names}
+
+    def add(self, pair, winner, decisions):
+        for side, name in enumerate(pair):
+            other = pair[1 - side]
+            self.games[name, other] += 1
+            seconds, moves = decisions[side]
+            self.seconds[name] += seconds
+            self.moves[name] += moves
+            if winner is None:
+                self.score[name, other] += 0.5
+                self.record[name][1] += 1
+            elif winner == side:
+                self.score[name, other] += 1
+                self.record[name][0] += 1
+            else:
+                self.record[name][2] += 1
+
+    def elo(self, iterations=200):
+        # Bradley-Terry strengths by minorization-maximization, with half a
+        # virtual win each way per pairing so a strategy that never scores
+        # still gets a finite rating. Scaled to Elo points around 1500.
+        strength = {name: 1.0 for name in self.names}
+        for _ in range(iterations):
+            updated = {}
+            for name in self.names:
+                wins = 0.0
+                total = 0.0
+                for other in self.names:
+                    if other == name or not self.games[name, other]:
+                        continue
+                    wins += self.score[name, other] + 0.5
+                    total += (self.games[name, other] + 1) / (strength[name] + strength[other])
+                updated[name] = wins / total if total else 1.0
+            scale = math.exp(sum(math.log(value) for value in updated.values()) / len(updated))
+            strength = {name: value / scale for name, value in updated.items()}
+        return {name: 1500 + 400 * math.log10(value) for name, value in strength.items()}
+
+    def report(self, elapsed=None):
+        names = self.names
+        width = max(8, *(len(name) for name in names))
+        if elapsed is not None:
+            games = sum(self.games.values()) // 2
+            print(f'{games} games in {elapsed:.2f}s, {games / elapsed:.1f} games/sec')
+
+        print()
+        print('win rate of row against column (draws count half)')
+        print(' ' * width + ''.join(f'{name:>{width + 2}}' for name in names))
+        for name in names:
+            cells = []
+            for other in names:
+                games = self.games[name, other]
+                cells.append(f'{self.score[name, other] / games:>{width + 2}.1%}' if games else ' ' * (width + 1) + '-')
+            print(f'{name:<{width}}' + ''.join(cells))
+
+        print()
+        elo = self.elo()
+        print(f'{"strategy":<{width}}    elo   games    wins   draws  losses   score  decision')
+        for name in sorted(names, key=elo.get, reverse=True):
+            wins, draws, losses = self.record[name]
+            games = wins + draws + losses
+            score = (wins + draws / 2) / games if games else 0
+            decision = self.seconds[name] / self.moves[name] * 1000 if self.moves[name] else 0
+            print(
+                f'{name:<{width}} {elo[name]:>6.0f} {games:>7} {wins:>7} {draws:>7} {losses:>7} '
+                f'{score:>7.1%} {decision:>7.2f}ms'
+            )
+
+
+def tournament(play, names, games, seed=0, workers=None, options=None):
+    start = time.perf_counter()
+    results = run(play, schedule(names, games, seed, options), workers)
+    standings = Standings(names)
+    for pair, winner, decisions in results:
+        standings.add(pair, winner, decisions)
+    return standings, time.perf_counter() - start
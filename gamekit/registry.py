@@ -0,0 +1,17 @@
+import importlib
+
+# Strategy registries of both games map names to 'module:Class' paths, imported
+# on first use so frontends only pay for the strategies they play. A name that
+# is not registered is taken as a 'module:Class' path itself, which loads any
+# other class following the game's strategy protocol.
+
+
+def load(registry, name):
+    path = registry.get(name, name)
+    module, _, attribute = path.partition(':')
+    if not attribute:
+        raise ValueError(f'unknown strategy {name}')
+    try:
+        return getattr(importlib.import_module(module), attribute)
+    except (ImportError, AttributeError):
+        raise ValueError(f'unknown strategy {name}') from None
@@ -0,0 +1,164 @@
+import array
+import mmap
+import os
+import struct
+import zlib
+
+# Precomputed AI tables kept on disk and memory-mapped read-only, so every
+# process of a worker pool shares the same pages instead of rebuilding its own
+# copy. A table is built on first use, written atomically and checked against
+# its CRC-32 on every load; a file that is missing, stale or corrupt is simply
+# rebuilt. GAME_TABLE_CACHE overrides the directory the files live in.
+ENVIRONMENT = 'GAME_TABLE_CACHE'
+
+MAGIC = b'GTBL'
+FORMAT_VERSION = 1
+# magic, format version, table version, key length, payload length, payload CRC-32
+HEADER = struct.Struct('<4sHHIQI')
+ALIGNMENT = 8
+
+# A payload of arrays starts with their count and one (typecode, item size,
+# offset, length) entry per array, offsets from the payload start.
+ARRAY_COUNT = struct.Struct('<I')
+ARRAY_ENTRY = struct.Struct('<cBxxQQ')
+
+_loaded = {}
+
+
+def directory():
+    path = os.environ.get(ENVIRONMENT)
+    if path:
+        return path
+    cache = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache, 'games')
+
+
+def _pad(length):
+    return -length % ALIGNMENT
+
+
+def _key_bytes(key):
+    return repr(key).encode()
+
+
+def path_for(name, key, folder=None):
+    digest = zlib.crc32(_key_bytes(key))
+    return os.path.join(folder or directory(), f'{name}-{digest:08x}.bin')
+
+
+def encode(key, payload, version=1):
+    key = _key_bytes(key)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, version, len(key), len(payload), zlib.crc32(payload))
+    start = header + key
+    return start + bytes(_pad(len(start))), payload
+
+
+def decode(data, key, version=1):
+    # The payload as a slice of data, or None when data is not a valid table
+    # for this key and version.
+    if len(data) < HEADER.size:
+        return None
+    magic, format_version, table_version, key_length, length, checksum = HEADER.unpack_from(data)
+    if magic != MAGIC or format_version != FORMAT_VERSION or table_version != version:
+        return None
+    start = HEADER.size + key_length
+    if bytes(data[HEADER.size:start]) != _key_bytes(key):
+        return None
+    start += _pad(start)
+    payload = data[start:start + length]
+    if len(payload) != length or zlib.crc32(payload) != checksum:
+        return None
+    return payload
+
+
+def _open(path, key, version):
+    # The payload of a valid table file mapped read-only, or None.
+    try:
+        with open(path, 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # Missing or unreadable files are rebuilt; ValueError is what mmap
+        # raises for an empty file.
+        return None
+    view = memoryview(mapped)
+    payload = decode(view, key, version)
+    if payload is None:
+        view.release()
+        mapped.close()
+    return payload
+
+
+def _write(path, header, payload):
+    # Write to a private temporary file and rename it into place, so readers
+    # never map a half written table and racing builders just replace each
+    # other's identical output.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temporary, 'wb') as file:
+            file.write(header)
+            file.write(payload)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def load(name, key, build, version=1, folder=None):
+    # A read-only memoryview of the table for key, built with build() (which
+    # returns bytes) when there is no valid cached copy. Tables that can not be
+    # written to disk are still returned, from memory.
+    path = path_for(name, key, folder)
+    cached = _loaded.get(path)
+    if cached is not None:
+        return cached
+
+    payload = _open(path, key, version)
+    if payload is None:
+        header, built = encode(key, build(), version)
+        try:
+            _write(path, header, built)
+            payload = _open(path, key, version)
+        except OSError:
+            pass
+        if payload is None:
+            payload = memoryview(built).toreadonly()
+    _loaded[path] = payload
+    return payload
+
+
+def pack_arrays(arrays):
+    offsets = []
+    offset = ARRAY_COUNT.size + ARRAY_ENTRY.size * len(arrays)
+    for values in arrays:
+        offset += _pad(offset)
+        offsets.append(offset)
+        offset += len(values) * values.itemsize
+
+    payload = bytearray(offset)
+    ARRAY_COUNT.pack_into(payload, 0, len(arrays))
+    for number, (values, start) in enumerate(zip(arrays, offsets)):
+        entry = ARRAY_COUNT.size + number * ARRAY_ENTRY.size
+        ARRAY_ENTRY.pack_into(payload, entry, values.typecode.encode(), values.itemsize, start, len(values))
+        payload[start:start + len(values) * values.itemsize] = values.tobytes()
+    return bytes(payload)
+
+
+def unpack_arrays(payload):
+    arrays = []
+    count, = ARRAY_COUNT.unpack_from(payload)
+    for number in range(count):
+        typecode, itemsize, offset, length = ARRAY_ENTRY.unpack_from(
+            payload, ARRAY_COUNT.size + number * ARRAY_ENTRY.size
+        )
+        typecode = typecode.decode()
+        if array.array(typecode).itemsize != itemsize:
+            raise ValueError(f'table array {typecode!r} has {itemsize} byte items on disk')
+        arrays.append(payload[offset:offset + length * itemsize].cast(typecode))
+    return arrays
+
+
+def load_arrays(name, key, build, version=1, folder=None):
+    # Like load, for a table made of array.array values: build() returns the
+    # list of arrays and the result is a list of memoryviews cast back to them.
+    return unpack_arrays(load(name, key, lambda: pack_arrays(build()), version, folder))
@@ -0,0 +1,137 @@
+import array
+import os
+from multiprocessing import Pool
+
+import pytest
+
+from gamekit import tablecache
+
+KEY = ('test', 3)
+DATA = bytes(range(256)) * 5
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    # Every test starts as a new process would, with nothing mapped yet.
+    monkeypatch.setattr(tablecache, '_loaded', {})
+
+
+class Builder:
+    def __init__(self, data=DATA):
+        self.data = data
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.data
+
+
+def load(folder, build, key=KEY, version=1):
+    tablecache._loaded.clear()
+    return tablecache.load('table', key, build, version, str(folder))
+
+
+def test_built_once_then_mapped(tmp_path):
+    build = Builder()
+    assert bytes(load(tmp_path, build)) == DATA
+    table = load(tmp_path, build)
+    assert bytes(table) == DATA and table.readonly
+    assert build.calls == 1
+    assert [path.name for path in tmp_path.iterdir()] == [os.path.basename(tablecache.path_for('table', KEY))]
+
+
+def test_loaded_tables_are_reused(tmp_path):
+    first = tablecache.load('table', KEY, Builder(), 1, str(tmp_path))
+    assert tablecache.load('table', KEY, Builder(b'other'), 1, str(tmp_path)) is first
+
+
+def test_payload_is_aligned(tmp_path):
+    load(tmp_path, Builder())
+    header, _ = tablecache.encode(KEY, DATA)
+    assert len(header) % tablecache.ALIGNMENT == 0
+    assert os.path.getsize(tablecache.path_for('table', KEY, str(tmp_path))) == len(header) + len(DATA)
+
+
+@pytest.mark.parametrize('damage', ['payload', 'checksum', 'truncate', 'empty', 'magic'])
+def test_damaged_files_are_rebuilt(tmp_path, damage):
+    load(tmp_path, Builder())
+    path = tablecache.path_for('table', KEY, str(tmp_path))
+    with open(path, 'rb') as file:
+        data = bytearray(file.read())
+    if damage == 'payload':
+        data[-1] ^= 1
+    elif damage == 'checksum':
+        data[tablecache.HEADER.size - 1] ^= 1
+    elif damage == 'truncate':
+        del data[-10:]
+    elif damage == 'empty':
+        data = b''
+    else:
+        data[:4] = b'XXXX'
+    with open(path, 'wb') as file:
+        file.write(data)
+
+    build = Builder()
+    assert bytes(load(tmp_path, build)) == DATA
+    assert build.calls == 1
+    # The rebuilt file is valid again.
+    assert bytes(load(tmp_path, Builder(b'unused'))) == DATA
+
+
+def test_version_change_rebuilds(tmp_path):
+    load(tmp_path, Builder(b'old'), version=1)
+    build = Builder(b'new')
+    assert bytes(load(tmp_path, build, version=2)) == b'new'
+    assert bytes(load(tmp_path, Builder(b'old'), version=1)) == b'old'
+
+
+def test_key_is_checked(tmp_path):
+    load(tmp_path, Builder(b'first'), key=('a',))
+    os.replace(tablecache.path_for('table', ('a',), str(tmp_path)), tablecache.path_for('table', ('b',), str(tmp_path)))
+    assert bytes(load(tmp_path, Builder(b'second'), key=('b',))) == b'second'
+
+
+def test_unwritable_folder_serves_from_memory(tmp_path):
+    folder = tmp_path / 'file'
+    folder.write_bytes(b'')
+    build = Builder()
+    table = load(folder, build)
+    assert bytes(table) == DATA and table.readonly
+
+
+def test_failed_write_leaves_nothing_behind(tmp_path, monkeypatch):
+    def fail(source, target):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(tablecache.os, 'replace', fail)
+    assert bytes(load(tmp_path, Builder())) == DATA
+    assert list(tmp_path.iterdir()) == []
+
+
+def _load_in_worker(folder):
+    tablecache._loaded.clear()
+    return bytes(tablecache.load('table', KEY, lambda: DATA, 1, folder))
+
+
+def test_racing_processes_agree(tmp_path):
+    with Pool(4) as pool:
+        results = pool.map(_load_in_worker, [str(tmp_path)] * 16)
+    assert all(result == DATA for result in results)
+    assert not list(tmp_path.glob('*.tmp'))
+    assert bytes(load(tmp_path, Builder(b'unused'))) == DATA
+
+
+def test_arrays_round_trip(tmp_path):
+    arrays = [array.array('B', [1, 2, 3]), array.array('i', range(-5, 5)), array.array('d', [0.5, 1.5]),
+              array.array('H')]
+    loaded = tablecache.load_arrays('arrays', KEY, lambda: arrays, 1, str(tmp_path))
+    assert [view.tolist() for view in loaded] == [values.tolist() for values in arrays]
+    assert [view.format for view in loaded] == ['B', 'i', 'd', 'H']
+
+
+def test_directory_from_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv(tablecache.ENVIRONMENT, str(tmp_path))
+    assert tablecache.directory() == str(tmp_path)
+    monkeypatch.delenv(tablecache.ENVIRONMENT)
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    assert tablecache.directory() == os.path.join(str(tmp_path), 'games')
@@ -0,0 +1,183 @@
+import argparse
+import time
+
+import numpy as np
+
+from gamekit import tablecache
+
+from solver import COMP, DIFFICULTIES, EMPTY, LINES, USER, table, wins
+
+# Thousands of 3x3 games advanced in lockstep. Boards are rows of an int8 array
+# in the EMPTY/USER/COMP encoding, one ply is played in every unfinished game at
+# once, and wins are found with one product against the line masks.
+
+LINE_MASKS = np.zeros((9, len(LINES)), np.float32)
+for _number, _line in enumerate(LINES):
+    LINE_MASKS[_line, _number] = 1
+
+# Base 3 place values of the cells, matching solver.encode.
+POWERS = 3 ** np.arange(9, dtype=np.int32)
+NO_MOVE = -128
+SCORES_VERSION = 1
+
+_scores = None
+
+
+def _build_move_scores():
+    solved = table()
+    scores = np.full((3 ** 9, 9), NO_MOVE, np.int8)
+    for code in range(3 ** 9):
+        board = [code // 3 ** i % 3 for i in range(9)]
+        own, other = board.count(1), board.count(2)
+        if other - own not in (0, 1) or own + other == 9 or wins(board, 1) or wins(board, 2):
+            continue
+        for cell in range(9):
+            if not board[cell]:
+                scores[code, cell] = solved.score(board, cell)
+    return scores.tobytes()
+
+
+def move_scores():
+    # Table move scores for every position, indexed by the solver encoding of
+    # the board as seen by the side to move. NO_MOVE marks taken cells and
+    # positions that cannot occur. The array is a read-only view of the mapped
+    # table cache file.
+    global _scores
+    if _scores is None:
+        data = tablecache.load('tic-tac-toe-scores', (3, 3, 3), _build_move_scores, SCORES_VERSION)
+        _scores = np.frombuffer(data, np.int8).reshape(3 ** 9, 9)
+    return _scores
+
+
+def encode(boards, player):
+    return (boards * np.int8(player) % 3).astype(np.int32) @ POWERS
+
+
+def random_policy(boards, player, rng):
+    keys = rng.random(boards.shape, dtype=np.float32)
+    keys[boards != EMPTY] = -1
+    return keys.argmax(1)
+
+
+def table_policy(difficulty='hard'):
+    mistake_rate = DIFFICULTIES[difficulty]
+
+    def policy(boards, player, rng):
+        scores = move_scores()[encode(boards, player)]
+        cells = scores.argmax(1)
+        if mistake_rate:
+            # Like Table.choose_move: sometimes pick a random move scoring
+            # below the best one, when there is any.
+            best = scores.max(1, keepdims=True)
+            worse = (scores != NO_MOVE) & (scores < best)
+            keys = rng.random(boards.shape, dtype=np.float32)
+            keys[~worse] = -1
+            slip = (rng.random(len(boards)) < mistake_rate) & worse.any(1)
+            cells[slip] = keys[slip].argmax(1)
+        return cells
+
+    return policy
+
+
+POLICIES = {
+    'random': lambda: random_policy,
+    'table': lambda: table_policy('hard'),
+    'medium': lambda: table_policy('medium'),
+    'easy': lambda: table_policy('easy'),
+}
+
+
+class Batch:
+    def __init__(self, count, first=USER, record=False, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.boards = np.zeros((count, 9), np.int8)
+        if first is None:
+            self.turn = np.where(self.rng.random(count) < 0.5, USER, COMP).astype(np.int8)
+        else:
+            self.turn = np.full(count, first, np.int8)
+        self.first = self.turn.copy()
+        self.winner = np.zeros(count, np.int8)
+        self.done = np.zeros(count, bool)
+        self.ply = 0
+        self.moves = np.full((count, 9), -1, np.int8) if record else None
+
+    def step(self, policies):
+        active = np.flatnonzero(~self.done)
+        if not active.size:
+            return False
+
+        boards = self.boards[active]
+        players = self.turn[active]
+        cells = np.empty(active.size, np.intp)
+        for player, policy in policies.items():
+            selected = players == player
+            if selected.any():
+                cells[selected] = policy(boards[selected], player, self.rng)
+
+        boards[np.arange(active.size), cells] = players
+        self.boards[active] = boards
+        if self.moves is not None:
+            self.moves[active, self.ply] = cells
+
+        sums = boards @ LINE_MASKS
+        won = (sums == 3 * players[:, None].astype(np.float32)).any(1)
+        full = ~(boards == EMPTY).any(1)
+        self.winner[active[won]] = players[won]
+        self.done[active[won | full]] = True
+        self.turn[active] = -players
+        self.ply += 1
+        return True
+
+    def play(self, policies):
+        while self.step(policies):
+            pass
+        return self.winner
+
+
+def simulate(games, user_policy, comp_policy, first=None, batch_size=100000, record=False, seed=None):
+    rng = np.random.default_rng(seed)
+    winners = []
+    firsts = []
+    moves = []
+    for start in range(0, games, batch_size):
+        batch = Batch(min(batch_size, games - start), first, record, rng.integers(1 << 63))
+        winners.append(batch.play({USER: user_policy, COMP: comp_policy}))
+        firsts.append(batch.first)
+        if record:
+            moves.append(batch.moves)
+    result = {'winners': np.concatenate(winners), 'first': np.concatenate(firsts)}
+    if record:
+        result['moves'] = np.concatenate(moves)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play many tic-tac-toe games at once with NumPy')
+    parser.add_argument('--games', type=int, default=1000000)
+    parser.add_argument('--user', choices=POLICIES, default='random', help='policy playing X')
+    parser.add_argument('--comp', choices=POLICIES, default='table', help='policy playing O')
+    parser.add_argument('--batch-size', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', metavar='PATH', help='write winners, first movers and moves to an .npz dataset')
+    args = parser.parse_args()
+
+    user, comp = POLICIES[args.user](), POLICIES[args.comp]()
+    if {args.user, args.comp} != {'random'}:
+        move_scores()
+
+    start = time.perf_counter()
+    result = simulate(args.games, user, comp, None, args.batch_size, bool(args.save), args.seed)
+    elapsed = time.perf_counter() - start
+
+    winners = result['winners']
+    print(f'{args.games} games in {elapsed:.2f}s, {args.games / elapsed * 60:,.0f} games/minute')
+    print(
+        f'X ({args.user}) {np.mean(winners == USER):.1%}, O ({args.comp}) {np.mean(winners == COMP):.1%}, '
+        f'draws {np.mean(winners == EMPTY):.1%}'
+    )
+    if args.save:
+        np.savez_compressed(args.save, **result)
+
+
+if __name__ == '__main__':
+    main()
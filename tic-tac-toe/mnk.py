@@ -0,0 +1,247 @@
+import argparse
+import random
+import time
+
+from solver import COMP, EMPTY, USER
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+class Board:
+    def __init__(self, width=3, height=3, k=3, seed=0):
+        self.width = width
+        self.height = height
+        self.k = k
+        self.flags = [EMPTY for _ in range(width * height)]
+        self.moves = []
+        self.winner = None
+
+        self.windows = []
+        for row in range(height):
+            for col in range(width):
+                for x, y in DIRECTIONS:
+                    end_row, end_col = row + x * (k - 1), col + y * (k - 1)
+                    if 0 <= end_row < height and 0 <= end_col < width:
+                        self.windows.append(tuple((row + x * i) * width + col + y * i for i in range(k)))
+
+        self.cell_windows = [[] for _ in self.flags]
+        for number, window in enumerate(self.windows):
+            for cell in window:
+                self.cell_windows[cell].append(number)
+
+        self.counts = {USER: [0] * len(self.windows), COMP: [0] * len(self.windows)}
+        self.weights = [0] + [10 ** i for i in range(k)]
+        self.evaluation = 0
+
+        radius = 1 if k <= 3 else 2
+        self.neighbours = []
+        for cell in range(len(self.flags)):
+            row, col = divmod(cell, width)
+            self.neighbours.append([
+                _row * width + _col
+                for _row in range(max(0, row - radius), min(height, row + radius + 1))
+                for _col in range(max(0, col - radius), min(width, col + radius + 1))
+                if (_row, _col) != (row, col)
+            ])
+
+        rng = random.Random(seed)
+        self.zobrist = {player: [rng.getrandbits(64) for _ in self.flags] for player in (USER, COMP)}
+        self.hash = 0
+
+    @property
+    def full(self):
+        return len(self.moves) == len(self.flags)
+
+    def _window_value(self, number):
+        user, comp = self.counts[USER][number], self.counts[COMP][number]
+        if user and comp:
+            return 0
+        return self.weights[user] - self.weights[comp]
+
+    def play(self, cell, player):
+        self.flags[cell] = player
+        self.moves.append(cell)
+        self.hash ^= self.zobrist[player][cell]
+        counts = self.counts[player]
+        for number in self.cell_windows[cell]:
+            self.evaluation -= self._window_value(number)
+            counts[number] += 1
+            self.evaluation += self._window_value(number)
+            if counts[number] == self.k:
+                self.winner = player
+
+    def undo(self):
+        cell = self.moves.pop()
+        player = self.flags[cell]
+        self.flags[cell] = EMPTY
+        self.hash ^= self.zobrist[player][cell]
+        counts = self.counts[player]
+        for number in self.cell_windows[cell]:
+            self.evaluation -= self._window_value(number)
+            counts[number] -= 1
+            self.evaluation += self._window_value(number)
+        self.winner = None
+
+    def candidates(self):
+        if not self.moves:
+            return [(self.height // 2) * self.width + self.width // 2]
+        cells = set()
+        for cell in self.moves:
+            for neighbour in self.neighbours[cell]:
+                if self.flags[neighbour] == EMPTY:
+                    cells.add(neighbour)
+        return list(cells)
+
+    def move_priority(self, cell):
+        # Cells that extend or block the longest open windows come first.
+        priority = 0
+        for number in self.cell_windows[cell]:
+            user, comp = self.counts[USER][number], self.counts[COMP][number]
+            if not comp:
+                priority += self.weights[user + 1]
+            if not user:
+                priority += self.weights[comp + 1]
+        return priority
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Search:
+    def __init__(self, board, time_budget=1.0, max_depth=None):
+        self.board = board
+        self.time_budget = time_budget
+        self.max_depth = max_depth or len(board.flags)
+        self.win_score = 10 ** (board.k + 4)
+        self.table = {}
+        self.nodes = 0
+        self.depth = 0
+        self.deadline = None
+
+    def best_move(self, player):
+        self.deadline = time.perf_counter() + self.time_budget
+        self.nodes = 0
+        best = None
+        empty = len(self.board.flags) - len(self.board.moves)
+        for depth in range(1, min(self.max_depth, empty) + 1):
+            try:
+                score, move = self._root(depth, player)
+            except SearchTimeout:
+                break
+            best, self.depth = move, depth
+            if abs(score) >= self.win_score - len(self.board.flags):
+                break
+        if best is None:
+            best = max(self.board.candidates(), key=self.board.move_priority)
+        return best
+
+    def _ordered(self, player, tt_move):
+        moves = sorted(self.board.candidates(), key=self.board.move_priority, reverse=True)
+        if tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        return moves
+
+    def _root(self, depth, player):
+        entry = self.table.get((self.board.hash, player))
+        alpha, beta = -self.win_score * 2, self.win_score * 2
+        best_move = None
+        for move in self._ordered(player, entry and entry[3]):
+            self.board.play(move, player)
+            try:
+                score = -self._negamax(depth - 1, -beta, -alpha, -player, 1)
+            finally:
+                self.board.undo()
+            if best_move is None or score > alpha:
+                alpha, best_move = score, move
+        self.table[self.board.hash, player] = (depth, alpha, EXACT, best_move)
+        return alpha, best_move
+
+    def _negamax(self, depth, alpha, beta, player, ply):
+        self.nodes += 1
+        if not self.nodes & 255 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        board = self.board
+        if board.winner is not None:
+            return -(self.win_score - ply)
+        if board.full:
+            return 0
+        if depth == 0:
+            return board.evaluation * player
+
+        key = (board.hash, player)
+        entry = self.table.get(key)
+        tt_move = None
+        if entry:
+            entry_depth, score, flag, tt_move = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return score
+                if flag == LOWER:
+                    alpha = max(alpha, score)
+                elif flag == UPPER:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        original_alpha = alpha
+        best_score = -self.win_score * 2
+        best_move = None
+        for move in self._ordered(player, tt_move):
+            board.play(move, player)
+            try:
+                score = -self._negamax(depth - 1, -beta, -alpha, -player, ply + 1)
+            finally:
+                board.undo()
+            if score > best_score:
+                best_score, best_move = score, move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (depth, best_score, flag, best_move)
+        return best_score
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Self-play benchmark for the m,n,k engine')
+    parser.add_argument('--width', type=int, default=15)
+    parser.add_argument('--height', type=int, default=15)
+    parser.add_argument('-k', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=0.5, help='seconds per move')
+    parser.add_argument('--moves', type=int, default=20)
+    args = parser.parse_args()
+
+    board = Board(args.width, args.height, args.k)
+    search = Search(board, time_budget=args.budget)
+    player = USER
+    for _ in range(args.moves):
+        if board.winner is not None or board.full:
+            break
+        start = time.perf_counter()
+        move = search.best_move(player)
+        elapsed = time.perf_counter() - start
+        board.play(move, player)
+        print(
+            f'{"X" if player == USER else "O"} {divmod(move, board.width)} '
+            f'depth {search.depth} nodes {search.nodes} {elapsed * 1000:.1f} ms'
+        )
+        player = -player
+
+    print({USER: 'X wins', COMP: 'O wins'}.get(board.winner, 'no winner'))
+
+
+if __name__ == '__main__':
+    main()
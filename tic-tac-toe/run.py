@@ -1,62 +1,45 @@
-import random
+import argparse
 import tkinter
 
-EMPTY = 0
-COMP = -1
-USER = 1
+from gamekit import metrics
+
+from mnk import Board
+from solver import COMP, DIFFICULTIES, EMPTY, USER
+from strategies import STRATEGIES, default_strategy, load_strategy
 
 
 class Field(tkinter.Frame):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, width=3, height=3, k=3, strategy=None, difficulty='hard', time_budget=1.0, **kwargs):
         super().__init__(*args, **kwargs)
         self.winner = None
-        self.flags = [EMPTY for _ in range(9)]
+        self.board = Board(width, height, k)
+        self.flags = self.board.flags
+        self.strategy = load_strategy(strategy or default_strategy(width, height, k))(
+            difficulty=difficulty, time_budget=time_budget
+        )
         self.buttons = [
             tkinter.Button(self, text='', command=self.turn(i))
-            for i in range(9)
+            for i in range(len(self.flags))
         ]
+        metrics.count('tic-tac-toe.widgets.Button', len(self.buttons))
         for i, btn in enumerate(self.buttons):
-            btn.grid(row=int(i / 3) + 1, column=i % 3)
-
-    def get_empty(self, indexes):
-        for i in indexes:
-            if self.flags[i] == EMPTY:
-                return i
-
-    def find_closest(self, user):
-        for i in range(3):
-            if sum(self.flags[i * 3: i * 3 + 3]) == 2 * user:
-                return self.get_empty(range(i * 3, i * 3 + 3))
-
-            if sum(self.flags[i::3]) == 2 * user:
-                return self.get_empty(range(i, len(self.flags), 3))
-
-        if sum(self.flags[::4]) == 2 * user:
-            return self.get_empty(range(0, len(self.flags), 3))
-
-        if sum(self.flags[2:7:2]) == 2 * user:
-            return self.get_empty(range(2, 7, 2))
+            btn.grid(row=i // width + 1, column=i % width)
 
+    @metrics.timed('tic-tac-toe.ai_turn')
     def ai_turn(self):
-        win_id = self.find_closest(COMP)
-        if win_id:
-            return win_id
-        block_id = self.find_closest(USER)
-        if block_id:
-            return block_id
-
-        random_ids = [i for i, x in enumerate(self.flags) if x == EMPTY]
-        random.shuffle(random_ids)
-        return random_ids[0]
+        metrics.count('tic-tac-toe.ai_turns')
+        return self.strategy.choose_move(self.board, COMP)
 
     def make_turn(self, cell, player):
         self.buttons[cell].destroy()
         lbl = tkinter.Label(self, text='X' if player == USER else 'O', padx=7, pady=6)
-        lbl.grid(row=int(cell / 3) + 1, column=cell % 3)
-        self.flags[cell] = player
+        metrics.count('tic-tac-toe.widgets.Label')
+        lbl.grid(row=cell // self.board.width + 1, column=cell % self.board.width)
+        self.board.play(cell, player)
         self.winner = self.get_winner()
 
     def turn(self, user_cell):
+        @metrics.timed('tic-tac-toe.event.click')
         def f():
             if self.winner is not None:
                 return
@@ -80,26 +63,13 @@ class Field(tkinter.Frame):
         else:
             winner_text = 'You are draw'
         lbl = tkinter.Label(self, text=winner_text)
-        lbl.grid(row=0, column=0, columnspan=3)
+        lbl.grid(row=0, column=0, columnspan=self.board.width)
 
     def get_winner(self):
-        sums = [
-            *(sum(self.flags[i * 3: i * 3 + 3]) for i in range(3)),
-            *(sum(self.flags[i::3]) for i in range(3)),
-            sum(self.flags[::4]),
-            sum(self.flags[2:7:2])
-        ]
-
-        filtered_sums = [
-            USER if s == USER * 3 else COMP
-            for s in sums
-            if s / 3 in (USER, COMP)
-        ]
-
-        if filtered_sums:
-            return filtered_sums[0]
+        if self.board.winner is not None:
+            return self.board.winner
 
-        if all(map(lambda x: x != EMPTY, self.flags)):
+        if self.board.full:
             return EMPTY
 
 
@@ -112,7 +82,19 @@ def configure(frame):
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--strategy', help=f'one of {", ".join(STRATEGIES)} or module:Class')
+    parser.add_argument('--difficulty', choices=DIFFICULTIES, default='hard')
+    parser.add_argument('--width', type=int, default=3)
+    parser.add_argument('--height', type=int, default=3)
+    parser.add_argument('-k', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=1.0, help='AI seconds per move on larger boards')
+    args = parser.parse_args()
+
     root = tkinter.Tk()
     configure(root)
-    Field(root).pack()
+    Field(
+        root, width=args.width, height=args.height, k=args.k,
+        strategy=args.strategy, difficulty=args.difficulty, time_budget=args.budget
+    ).pack()
     root.mainloop()
@@ -0,0 +1,172 @@
+import random
+import struct
+import sys
+
+from gamekit import tablecache
+
+EMPTY = 0
+COMP = -1
+USER = 1
+
+LINES = [
+    (0, 1, 2), (3, 4, 5), (6, 7, 8),
+    (0, 3, 6), (1, 4, 7), (2, 5, 8),
+    (0, 4, 8), (2, 4, 6),
+]
+
+DIFFICULTIES = {
+    'easy': 0.6,
+    'medium': 0.25,
+    'hard': 0,
+}
+
+RECORD = struct.Struct('<HbB')
+TABLE_NAME = 'tic-tac-toe-table'
+TABLE_KEY = (3, 3, 3)
+TABLE_VERSION = 1
+
+
+def _rotate(perm):
+    return tuple(perm[6 - 3 * (i % 3) + i // 3] for i in range(9))
+
+
+def _mirror(perm):
+    return tuple(perm[3 * (i // 3) + 2 - i % 3] for i in range(9))
+
+
+def _symmetries():
+    perms = []
+    perm = tuple(range(9))
+    for _ in range(4):
+        perms.extend((perm, _mirror(perm)))
+        perm = _rotate(perm)
+    return perms
+
+
+SYMMETRIES = _symmetries()
+
+
+# Boards are stored from the point of view of the side to move:
+# 1 marks its own cells and 2 the opponent's.
+def relative(flags, player):
+    return tuple(0 if flag == EMPTY else 1 if flag == player else 2 for flag in flags)
+
+
+def encode(board):
+    code = 0
+    for cell in reversed(board):
+        code = code * 3 + cell
+    return code
+
+
+def canonical(board):
+    return min((encode([board[i] for i in perm]), perm) for perm in SYMMETRIES)
+
+
+def wins(board, mark):
+    return any(board[a] == board[b] == board[c] == mark for a, b, c in LINES)
+
+
+def move_score(board, cell):
+    # Score of playing `cell` for the side to move; quicker wins score higher.
+    child = list(board)
+    child[cell] = 1
+    marks = 9 - child.count(0)
+    if wins(child, 1):
+        return 10 - marks
+    if marks == 9:
+        return 0
+    return None
+
+
+class Table:
+    def __init__(self, entries=None):
+        self.entries = entries if entries is not None else {}
+
+    @classmethod
+    def build(cls):
+        table = cls()
+        table.solve((0,) * 9)
+        return table
+
+    def solve(self, board):
+        code, _ = canonical(board)
+        if code in self.entries:
+            return self.entries[code][0]
+
+        board = [0] * 9
+        for i in range(9):
+            board[i] = code // 3 ** i % 3
+
+        best_score = best_move = None
+        for cell in range(9):
+            if board[cell]:
+                continue
+            score = self.score(board, cell)
+            if best_score is None or score > best_score:
+                best_score, best_move = score, cell
+
+        self.entries[code] = (best_score, best_move)
+        return best_score
+
+    def score(self, board, cell):
+        score = move_score(board, cell)
+        if score is not None:
+            return score
+        child = tuple(2 if mark == 1 else 1 if mark == 2 else 0 for mark in board)
+        child = child[:cell] + (2,) + child[cell + 1:]
+        return -self.solve(child)
+
+    def best_move(self, flags, player):
+        board = relative(flags, player)
+        code, perm = canonical(board)
+        return perm[self.entries[code][1]]
+
+    def move_scores(self, flags, player):
+        board = relative(flags, player)
+        return {cell: self.score(board, cell) for cell in range(9) if not board[cell]}
+
+    def choose_move(self, flags, player, difficulty='hard', rng=random):
+        best = self.best_move(flags, player)
+        if rng.random() >= DIFFICULTIES[difficulty]:
+            return best
+
+        scores = self.move_scores(flags, player)
+        mistakes = [cell for cell, score in scores.items() if score < scores[best]]
+        return rng.choice(mistakes) if mistakes else best
+
+    def to_bytes(self):
+        return b''.join(RECORD.pack(code, *self.entries[code]) for code in sorted(self.entries))
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls({code: (score, move) for code, score, move in RECORD.iter_unpack(data)})
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            return cls.from_bytes(file.read())
+
+
+_table = None
+
+
+def table():
+    global _table
+    if _table is None:
+        # Solved once per machine and shared through the table cache.
+        data = tablecache.load(TABLE_NAME, TABLE_KEY, lambda: Table.build().to_bytes(), TABLE_VERSION)
+        _table = Table.from_bytes(data)
+    return _table
+
+
+if __name__ == '__main__':
+    # Fills the table cache; with a path, also exports the table there.
+    table()
+    print(tablecache.path_for(TABLE_NAME, TABLE_KEY))
+    if len(sys.argv) > 1:
+        table().save(sys.argv[1])
@@ -0,0 +1,59 @@
+import random
+from functools import partial
+
+from gamekit import registry
+
+from mnk import Search
+from solver import table
+
+# A tic-tac-toe strategy is a class built as Strategy(seed=None, **options)
+# with one method:
+#   choose_move(board, player)  -> cell index to play on the mnk.Board
+# Options a strategy does not use are ignored, so frontends can pass the same
+# settings to any of them. Names are resolved by gamekit.registry.
+
+
+class RandomStrategy:
+    def __init__(self, seed=None, **options):
+        self.random = random.Random(seed)
+
+    def choose_move(self, board, player):
+        return self.random.choice([cell for cell, flag in enumerate(board.flags) if not flag])
+
+
+class TableStrategy:
+    # The solved 3x3 table, with deliberate mistakes on easier difficulties.
+    def __init__(self, seed=None, difficulty='hard', **options):
+        self.random = random.Random(seed)
+        self.difficulty = difficulty
+
+    def choose_move(self, board, player):
+        if (board.width, board.height, board.k) != (3, 3, 3):
+            raise ValueError('the table only covers 3x3 boards with k=3')
+        return table().choose_move(board.flags, player, self.difficulty, self.random)
+
+
+class SearchStrategy:
+    def __init__(self, seed=None, time_budget=1.0, max_depth=None, **options):
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.search = None
+
+    def choose_move(self, board, player):
+        if self.search is None or self.search.board is not board:
+            self.search = Search(board, self.time_budget, self.max_depth)
+        return self.search.best_move(player)
+
+
+STRATEGIES = {
+    'random': 'strategies:RandomStrategy',
+    'table': 'strategies:TableStrategy',
+    'search': 'strategies:SearchStrategy',
+}
+
+
+def default_strategy(width, height, k):
+    return 'table' if (width, height, k) == (3, 3, 3) else 'search'
+
+
+load_strategy = partial(registry.load, STRATEGIES)
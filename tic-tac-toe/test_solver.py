@@ -0,0 +1,93 @@
+import random
+from functools import lru_cache
+
+import pytest
+
+import solver
+from solver import COMP, EMPTY, USER, Table
+
+LINES = [(a, a + 1, a + 2) for a in (0, 3, 6)] + [(a, a + 3, a + 6) for a in range(3)] + [(0, 4, 8), (2, 4, 6)]
+
+
+def won(flags, player):
+    return any(all(flags[cell] == player for cell in line) for line in LINES)
+
+
+@lru_cache(maxsize=None)
+def negamax(flags, player):
+    # Scores of every move for player, as the table scores them: a win with n
+    # marks on the board is worth 10 - n, a draw 0.
+    scores = {}
+    for cell in range(9):
+        if flags[cell] != EMPTY:
+            continue
+        child = flags[:cell] + (player,) + flags[cell + 1:]
+        if won(child, player):
+            scores[cell] = 10 - (9 - child.count(EMPTY))
+        elif EMPTY not in child:
+            scores[cell] = 0
+        else:
+            scores[cell] = -max(negamax(child, -player).values())
+    return scores
+
+
+def positions():
+    # Every position reachable with USER moving first, with the side to move.
+    seen = set()
+    stack = [((EMPTY,) * 9, USER)]
+    while stack:
+        flags, player = stack.pop()
+        if (flags, player) in seen:
+            continue
+        seen.add((flags, player))
+        for cell in range(9):
+            if flags[cell] == EMPTY:
+                child = flags[:cell] + (player,) + flags[cell + 1:]
+                if not won(child, player) and EMPTY in child:
+                    stack.append((child, -player))
+    return seen
+
+
+@pytest.fixture(scope='module')
+def table():
+    return Table.build()
+
+
+def test_table_matches_negamax(table):
+    for flags, player in positions():
+        expected = negamax(flags, player)
+        assert table.move_scores(flags, player) == expected
+        assert expected[table.best_move(flags, player)] == max(expected.values())
+
+
+def test_perfect_play_draws(table):
+    assert max(negamax((EMPTY,) * 9, USER).values()) == 0
+    flags = [EMPTY] * 9
+    player = USER
+    while EMPTY in flags and not won(flags, -player):
+        flags[table.best_move(flags, player)] = player
+        player = -player
+    assert not won(flags, USER) and not won(flags, COMP)
+
+
+def test_bytes_round_trip(table):
+    assert Table.from_bytes(table.to_bytes()).entries == table.entries
+
+
+def test_mistakes_stay_legal(table):
+    rng = random.Random(0)
+    # X can force a win here, and most moves throw it away.
+    flags = (USER, COMP, EMPTY, EMPTY, EMPTY, EMPTY, EMPTY, EMPTY, EMPTY)
+    best = table.best_move(flags, USER)
+    assert min(table.move_scores(flags, USER).values()) < table.move_scores(flags, USER)[best]
+    assert all(table.choose_move(flags, USER, 'hard', rng) == best for _ in range(50))
+    moves = {table.choose_move(flags, USER, 'easy', rng) for _ in range(200)}
+    assert best in moves and len(moves) > 1
+    assert all(flags[move] == EMPTY for move in moves)
+
+
+def test_table_is_cached(table, tmp_path, monkeypatch):
+    monkeypatch.setenv('GAME_TABLE_CACHE', str(tmp_path))
+    monkeypatch.setattr(solver, '_table', None)
+    assert solver.table().entries == table.entries
+    assert list(tmp_path.glob('tic-tac-toe-table-*.bin'))
@@ -0,0 +1,57 @@
+import argparse
+import os
+import time
+
+from gamekit import ratings
+
+from mnk import Board
+from solver import COMP, DIFFICULTIES, USER
+from strategies import STRATEGIES, load_strategy
+
+# The first seat plays X and moves first.
+MARKS = (USER, COMP)
+
+
+def play(task):
+    pair, seed, (width, height, k, options) = task
+    board = Board(width, height, k)
+    players = [load_strategy(name)(seed * 2 + side, **options) for side, name in enumerate(pair)]
+    decisions = [[0.0, 0], [0.0, 0]]
+
+    side = 0
+    while board.winner is None and not board.full:
+        start = time.perf_counter()
+        cell = players[side].choose_move(board, MARKS[side])
+        decisions[side][0] += time.perf_counter() - start
+        decisions[side][1] += 1
+        board.play(cell, MARKS[side])
+        side = 1 - side
+
+    return (None if board.winner is None else MARKS.index(board.winner)), decisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Round-robin tournament between tic-tac-toe strategies')
+    parser.add_argument('strategies', nargs='*', help=f'default: all of {", ".join(STRATEGIES)}')
+    parser.add_argument('--games', type=int, default=100, help='games per pairing')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--width', type=int, default=3)
+    parser.add_argument('--height', type=int, default=3)
+    parser.add_argument('-k', type=int, default=3)
+    parser.add_argument('--difficulty', choices=DIFFICULTIES, default='hard')
+    parser.add_argument('--budget', type=float, default=0.1, help='search seconds per move')
+    args = parser.parse_args()
+
+    names = args.strategies or list(STRATEGIES)
+    if len(names) < 2:
+        parser.error('a tournament needs at least two strategies')
+    options = {'difficulty': args.difficulty, 'time_budget': args.budget}
+    standings, elapsed = ratings.tournament(
+        play, names, args.games, args.seed, args.workers, (args.width, args.height, args.k, options)
+    )
+    standings.report(elapsed)
+
+
+if __name__ == '__main__':
+    main()